@@ -0,0 +1,755 @@
+# Copyright (c) 2022 Jan Vrany
+#
+# This program and the accompanying materials are made available under
+# the terms of the MIT license, see LICENSE file.
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Fake `gdb` module to run OpenJ9 support outside of GDB, in plain
+CPython. It implements just enough of GDB Python API (and of jv's
+extensions to create objfiles, compunits, symtabs and so on) for
+OpenJ9 support to load and for its hot paths to run against synthetic
+(or recorded) memory, types and frames.
+
+Functions and attributes starting with `fake_` are not part of
+GDB API. They're used by benchmarks (and replay) to set up the
+fake inferior.
+"""
+from bisect import bisect_right
+
+class error(RuntimeError):
+    pass
+
+class MemoryError(error):
+    pass
+
+#
+# Events
+#
+
+class EventRegistry(object):
+    def __init__(self):
+        self._handlers = []
+
+    def connect(self, handler):
+        self._handlers.append(handler)
+
+    def disconnect(self, handler):
+        self._handlers.remove(handler)
+
+    def fake_fire(self, event = None):
+        for handler in list(self._handlers):
+            handler(event)
+
+class _Events(object):
+    pass
+
+events = _Events()
+for _name in ('cont', 'stop', 'exited', 'new_objfile', 'clear_objfiles', 'memory_changed',
+              'register_changed', 'inferior_call', 'before_prompt', 'new_thread',
+              'new_inferior', 'inferior_deleted', 'breakpoint_created',
+              'breakpoint_modified', 'breakpoint_deleted'):
+    setattr(events, _name, EventRegistry())
+
+class ContinueEvent(object):
+    def __init__(self, thread = None):
+        self.inferior_thread = thread
+
+class StopEvent(object):
+    pass
+
+class SignalEvent(StopEvent):
+    def __init__(self, stop_signal):
+        self.stop_signal = stop_signal
+
+class ClearObjFilesEvent(object):
+    def __init__(self, progspace):
+        self.progspace = progspace
+
+class NewObjFileEvent(object):
+    def __init__(self, objfile):
+        self.new_objfile = objfile
+
+class BreakpointEvent(StopEvent):
+    def __init__(self, breakpoints):
+        self.breakpoints = breakpoints
+        self.breakpoint = breakpoints[0]
+
+def fake_resume():
+    """
+    Emulate the inferior being resumed and stopped again: fire
+    `cont` and `stop` events.
+    """
+    events.cont.fake_fire(ContinueEvent())
+    events.stop.fake_fire(StopEvent())
+
+#
+# Constants
+#
+
+COMMAND_NONE = -1
+COMMAND_RUNNING = 0
+COMMAND_DATA = 1
+COMMAND_STACK = 2
+COMMAND_FILES = 3
+COMMAND_SUPPORT = 4
+COMMAND_STATUS = 5
+COMMAND_BREAKPOINTS = 6
+COMMAND_TRACEPOINTS = 7
+COMMAND_OBSCURE = 8
+COMMAND_MAINTENANCE = 9
+COMMAND_USER = 10
+
+COMPLETE_NONE = 0
+COMPLETE_FILENAME = 1
+COMPLETE_LOCATION = 2
+COMPLETE_COMMAND = 3
+COMPLETE_SYMBOL = 4
+COMPLETE_EXPRESSION = 5
+
+PARAM_BOOLEAN = 0
+PARAM_AUTO_BOOLEAN = 1
+PARAM_UINTEGER = 2
+PARAM_INTEGER = 3
+PARAM_STRING = 4
+PARAM_STRING_NOESCAPE = 5
+PARAM_OPTIONAL_FILENAME = 6
+PARAM_FILENAME = 7
+PARAM_ZINTEGER = 8
+PARAM_ZUINTEGER = 9
+PARAM_ZUINTEGER_UNLIMITED = 10
+PARAM_ENUM = 11
+
+TYPE_CODE_PTR = 1
+TYPE_CODE_ARRAY = 2
+TYPE_CODE_STRUCT = 3
+TYPE_CODE_UNION = 4
+TYPE_CODE_ENUM = 5
+TYPE_CODE_FUNC = 7
+TYPE_CODE_INT = 8
+TYPE_CODE_VOID = 10
+TYPE_CODE_BOOL = 20
+
+SYMBOL_UNDEF_DOMAIN = 0
+SYMBOL_VAR_DOMAIN = 1
+SYMBOL_STRUCT_DOMAIN = 2
+SYMBOL_FUNCTION_DOMAIN = 5
+SYMBOL_LOC_BLOCK = 10
+
+#
+# Types and values
+#
+
+class Field(object):
+    def __init__(self, name, bitpos, type, bitsize = 0, is_base_class = False):
+        self.name = name
+        self.bitpos = bitpos
+        self.type = type
+        self.bitsize = bitsize
+        self.is_base_class = is_base_class
+        self.artificial = False
+
+class Type(object):
+    def __init__(self, name, code, sizeof, fields = (), target = None, is_signed = False):
+        self.name = name
+        self.code = code
+        self.sizeof = sizeof
+        self.is_signed = is_signed
+        self.objfile = None
+        self._fields = list(fields)
+        self._target = target
+        self._pointer = None
+
+    def fields(self):
+        if self.code not in (TYPE_CODE_STRUCT, TYPE_CODE_UNION, TYPE_CODE_FUNC):
+            raise TypeError("Type is not a structure, union, enum, or function type.")
+        return self._fields
+
+    def __getitem__(self, name):
+        for field in self.fields():
+            if field.name == name:
+                return field
+        raise KeyError(name)
+
+    def target(self):
+        if self._target == None:
+            raise RuntimeError("Type does not have a target.")
+        return self._target
+
+    def pointer(self):
+        if self._pointer == None:
+            self._pointer = Type(self.name + ' *', TYPE_CODE_PTR, 8, target = self)
+            self._pointer.objfile = self.objfile
+        return self._pointer
+
+    def function(self, *args):
+        return Type(self.name + ' (void)', TYPE_CODE_FUNC, 1, target = self)
+
+    def strip_typedefs(self):
+        return self
+
+    def unqualified(self):
+        return self
+
+    def __str__(self):
+        return self.name
+
+    def __repr__(self):
+        return "<gdb.Type %s>" % self.name
+
+_types = {}
+
+def fake_define_type(type):
+    """
+    Make `type` known to lookup_type().
+    """
+    _types[type.name] = type
+    return type
+
+def fake_int_type(name, size, signed = False):
+    return fake_define_type(Type(name, TYPE_CODE_INT, size, is_signed = signed))
+
+def fake_struct_type(name, size, fields):
+    """
+    Define struct type of given size. `fields` is a list of
+    (name, byte offset, type)
+    """
+    return fake_define_type(Type(name, TYPE_CODE_STRUCT, size,
+                                 [Field(fname, offset * 8, ftype) for fname, offset, ftype in fields]))
+
+_void = fake_define_type(Type('void', TYPE_CODE_VOID, 1))
+for _name, _size, _signed in (('char', 1, True), ('short', 2, True), ('int', 4, True), ('long', 8, True),
+                              ('unsigned char', 1, False), ('unsigned short', 2, False),
+                              ('unsigned int', 4, False), ('unsigned long', 8, False),
+                              ('U_8', 1, False), ('U_16', 2, False), ('U_32', 4, False), ('U_64', 8, False),
+                              ('I_8', 1, True), ('I_16', 2, True), ('I_32', 4, True), ('I_64', 8, True),
+                              ('UDATA', 8, False), ('IDATA', 8, True)):
+    fake_int_type(_name, _size, _signed)
+_long = _types['long']
+
+def lookup_type(name, block = None):
+    type = _types.get(name)
+    if type == None:
+        raise error("No type named %s." % name)
+    return type
+
+class Value(object):
+    """
+    A value of scalar (integer or pointer) type or an lvalue of
+    struct type (in inferior's memory).
+    """
+    def __init__(self, val, type = None):
+        if isinstance(val, Value):
+            type = type or val.type
+            val = val._val
+        self.type = type if type != None else _long
+        self._val = int(val)
+        self.is_lazy = False
+        self.is_optimized_out = False
+
+    @property
+    def _is_lvalue(self):
+        return self.type.code in (TYPE_CODE_STRUCT, TYPE_CODE_UNION, TYPE_CODE_ARRAY)
+
+    @property
+    def address(self):
+        if self._is_lvalue:
+            return Value(self._val, self.type.pointer())
+        return None
+
+    @staticmethod
+    def _at(addr, type):
+        if type.code in (TYPE_CODE_STRUCT, TYPE_CODE_UNION, TYPE_CODE_ARRAY):
+            return Value(addr, type)
+        raw = bytes(_inferior.read_memory(addr, type.sizeof))
+        return Value(int.from_bytes(raw, 'little', signed = type.is_signed), type)
+
+    def dereference(self):
+        if self.type.code != TYPE_CODE_PTR:
+            raise error("Attempt to take contents of a non-pointer value.")
+        return Value._at(self._val, self.type.target())
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            struct = self.type.target() if self.type.code == TYPE_CODE_PTR else self.type
+            field = _find_field(struct, key)
+            if field == None:
+                raise error("There is no member named %s." % key)
+            bitpos, ftype = field
+            addr = self._val + bitpos // 8
+            return Value._at(addr, ftype)
+        elif self.type.code == TYPE_CODE_PTR:
+            return Value._at(self._val + int(key) * self.type.target().sizeof, self.type.target())
+        elif self.type.code == TYPE_CODE_ARRAY:
+            return Value._at(self._val + int(key) * self.type.target().sizeof, self.type.target())
+        raise error("Cannot subscript requested type.")
+
+    def cast(self, type):
+        return Value(self._val, type)
+
+    reinterpret_cast = cast
+    dynamic_cast = cast
+
+    def fetch_lazy(self):
+        pass
+
+    def format_string(self, *args, **kwargs):
+        if self.type.code == TYPE_CODE_PTR:
+            return "(%s) 0x%x" % (self.type, self._val)
+        return str(self._val)
+
+    def __int__(self):
+        return self._val
+
+    __index__ = __int__
+
+    def __bool__(self):
+        return self._val != 0
+
+    def __hash__(self):
+        return hash(self._val)
+
+    def _arith(self, other, op):
+        other = int(other)
+        if self.type.code == TYPE_CODE_PTR:
+            return Value(op(self._val, other * self.type.target().sizeof), self.type)
+        return Value(op(self._val, other), self.type)
+
+    def __add__(self, other):
+        return self._arith(other, lambda a, b: a + b)
+
+    def __radd__(self, other):
+        return self.__add__(other)
+
+    def __sub__(self, other):
+        if isinstance(other, Value) and other.type.code == TYPE_CODE_PTR and self.type.code == TYPE_CODE_PTR:
+            return Value((self._val - other._val) // self.type.target().sizeof)
+        return self._arith(other, lambda a, b: a - b)
+
+    def __and__(self, other):
+        return Value(self._val & int(other), self.type)
+
+    def __or__(self, other):
+        return Value(self._val | int(other), self.type)
+
+    def __lshift__(self, other):
+        return Value(self._val << int(other), self.type)
+
+    def __rshift__(self, other):
+        return Value(self._val >> int(other), self.type)
+
+    def __eq__(self, other):
+        try:
+            return self._val == int(other)
+        except TypeError:
+            return False
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __lt__(self, other):
+        return self._val < int(other)
+
+    def __le__(self, other):
+        return self._val <= int(other)
+
+    def __gt__(self, other):
+        return self._val > int(other)
+
+    def __ge__(self, other):
+        return self._val >= int(other)
+
+    def __str__(self):
+        return self.format_string()
+
+    def __repr__(self):
+        return "<gdb.Value %s>" % self.format_string()
+
+def _find_field(type, name, bitpos = 0):
+    for field in type.fields():
+        if field.name == name:
+            return (bitpos + field.bitpos, field.type)
+        if field.is_base_class:
+            found = _find_field(field.type, name, bitpos + field.bitpos)
+            if found != None:
+                return found
+    return None
+
+def default_visualizer(value):
+    return None
+
+#
+# Memory
+#
+
+class FakeMemory(object):
+    """
+    Sparse memory made of (non-overlapping) regions.
+    """
+    def __init__(self):
+        self._starts = []
+        self._regions = []
+
+    def map(self, addr, size):
+        """
+        Map a (zero-filled) region of given size at given address
+        and return it as bytearray.
+        """
+        data = bytearray(size)
+        i = bisect_right(self._starts, addr)
+        self._starts.insert(i, addr)
+        self._regions.insert(i, data)
+        return data
+
+    def write(self, addr, data):
+        start, region = self._region(addr, len(data))
+        region[addr - start:addr - start + len(data)] = data
+
+    def read(self, addr, size):
+        start, region = self._region(addr, size)
+        return memoryview(region)[addr - start:addr - start + size]
+
+    def regions(self):
+        return list(zip(self._starts, self._regions))
+
+    def _region(self, addr, size):
+        i = bisect_right(self._starts, addr) - 1
+        if i >= 0:
+            start = self._starts[i]
+            region = self._regions[i]
+            if addr + size <= start + len(region):
+                return start, region
+        raise MemoryError("Cannot access memory at address 0x%x" % addr)
+
+#
+# Inferiors, threads and frames
+#
+
+class Architecture(object):
+    def __init__(self, name = 'riscv:rv64'):
+        self._name = name
+
+    def name(self):
+        return self._name
+
+    def void_type(self):
+        return _void
+
+    def disassemble(self, start_pc, end_pc = None, count = None):
+        if end_pc == None:
+            end_pc = start_pc
+        insns = []
+        pc = start_pc
+        while pc <= end_pc and (count == None or len(insns) < count):
+            word = int.from_bytes(bytes(_inferior.read_memory(pc, 4)), 'little')
+            insns.append({ 'addr' : pc, 'asm' : '.word 0x%08x' % word, 'length' : 4 })
+            pc = pc + 4
+        return insns
+
+class InferiorThread(object):
+    def __init__(self, inferior, num, registers = None):
+        self.inferior = inferior
+        self.num = num
+        self.global_num = num
+        self.ptid = (inferior.pid, num, 0)
+        self.name = None
+        self.registers = registers or {}
+
+    def is_valid(self):
+        return True
+
+    def is_running(self):
+        return False
+
+    def is_stopped(self):
+        return True
+
+    def is_exited(self):
+        return False
+
+    def switch(self):
+        global _selected_thread
+        _selected_thread = self
+
+class Inferior(object):
+    def __init__(self, num = 1, pid = 4242):
+        self.num = num
+        self.pid = pid
+        self.memory = FakeMemory()
+        self._threads = [InferiorThread(self, 1)]
+        self._arch = Architecture()
+        self.progspace = None
+
+    def threads(self):
+        return tuple(self._threads)
+
+    def architecture(self):
+        return self._arch
+
+    def read_memory(self, addr, length):
+        return self.memory.read(int(addr), int(length))
+
+    def write_memory(self, addr, buf, length = None):
+        self.memory.write(int(addr), bytes(buf)[:length])
+
+    def is_valid(self):
+        return True
+
+_inferior = Inferior()
+_selected_thread = _inferior._threads[0]
+
+def fake_reset(pid = 4242):
+    """
+    Replace the inferior with a fresh one (with empty memory) and
+    forget all objfiles.
+    """
+    global _inferior, _selected_thread
+    _inferior = Inferior(pid = pid)
+    _inferior.progspace = _progspace
+    _selected_thread = _inferior._threads[0]
+    del _progspace._objfiles[:]
+    events.clear_objfiles.fake_fire(ClearObjFilesEvent(_progspace))
+    events.memory_changed.fake_fire(None)
+    return _inferior
+
+def selected_inferior():
+    return _inferior
+
+def inferiors():
+    return (_inferior, )
+
+def selected_thread():
+    return _selected_thread
+
+class UnwindInfo(object):
+    def __init__(self, frame_id):
+        self.frame_id = frame_id
+        self.registers = {}
+
+    def add_saved_register(self, reg, value):
+        self.registers[reg] = value
+
+class PendingFrame(object):
+    """
+    Pending frame with given register values (a dictionary
+    of register name to integer value).
+    """
+    def __init__(self, registers, architecture = None):
+        self._registers = registers
+        self._arch = architecture or _inferior.architecture()
+
+    def read_register(self, reg):
+        if not reg in self._registers:
+            raise ValueError("Bad register: %s" % reg)
+        return Value(self._registers[reg], _long)
+
+    def architecture(self):
+        return self._arch
+
+    def create_unwind_info(self, frame_id):
+        return UnwindInfo(frame_id)
+
+    def level(self):
+        return 0
+
+    def is_valid(self):
+        return True
+
+def newest_frame():
+    raise error("No stack.")
+
+def selected_frame():
+    raise error("No frame is currently selected.")
+
+#
+# Objfiles, symtabs and friends (including jv's extensions)
+#
+
+class Objfile(object):
+    def __init__(self, filename):
+        self.filename = filename
+        self.username = filename
+        self.pretty_printers = []
+        self.frame_unwinders = []
+        self.type_printers = []
+        _progspace._objfiles.append(self)
+        events.new_objfile.fake_fire(NewObjFileEvent(self))
+
+    def is_valid(self):
+        return True
+
+class Progspace(object):
+    def __init__(self):
+        self.filename = None
+        self.pretty_printers = []
+        self.frame_unwinders = []
+        self.type_printers = []
+        self._objfiles = []
+
+    def objfiles(self):
+        return list(self._objfiles)
+
+    def solib_name(self, addr):
+        return None
+
+_progspace = Progspace()
+_inferior.progspace = _progspace
+
+def current_progspace():
+    return _progspace
+
+def progspaces():
+    return [_progspace]
+
+def objfiles():
+    return _progspace.objfiles()
+
+class Block(object):
+    def __init__(self, superblock, start, end):
+        self.superblock = superblock
+        self.start = start
+        self.end = end
+        self._symbols = []
+
+    def add_symbol(self, symbol):
+        self._symbols.append(symbol)
+
+    def __iter__(self):
+        return iter(self._symbols)
+
+class Compunit(object):
+    def __init__(self, filename, objfile, start, end, nblocks):
+        self.filename = filename
+        self.objfile = objfile
+        self._global = Block(None, start, end)
+        self._static = Block(self._global, start, end)
+
+    def global_block(self):
+        return self._global
+
+    def static_block(self):
+        return self._static
+
+class LineTableEntry(object):
+    def __init__(self, line, pc, is_stmt = True, prologue_end = False):
+        self.line = line
+        self.pc = pc
+        self.is_stmt = is_stmt
+        self.prologue_end = prologue_end
+
+class LineTable(object):
+    def __init__(self, symtab, entries):
+        self._entries = list(entries)
+        symtab._linetable = self
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+class Symtab(object):
+    def __init__(self, filename, compunit):
+        self.filename = filename
+        self.objfile = compunit.objfile
+        self._compunit = compunit
+        self._linetable = None
+
+    def linetable(self):
+        return self._linetable
+
+    def is_valid(self):
+        return True
+
+class Symbol(object):
+    def __init__(self, name, symtab, type, domain, addr_class, block):
+        self.name = name
+        self.symtab = symtab
+        self.type = type
+        self.domain = domain
+        self.addr_class = addr_class
+        self.value = block
+
+#
+# Commands, parameters and breakpoints
+#
+
+class Command(object):
+    def __init__(self, name, command_class, completer_class = COMPLETE_NONE, prefix = False):
+        self._command_name = name
+
+    def dont_repeat(self):
+        pass
+
+_parameters = {}
+
+class Parameter(object):
+    def __init__(self, name, command_class, parameter_class, enum_sequence = None):
+        self.value = enum_sequence[0] if enum_sequence else None
+        _parameters[name] = self
+
+def parameter(name):
+    return _parameters[name].value
+
+_breakpoints = []
+
+class Breakpoint(object):
+    def __init__(self, spec, type = None, wp_class = None, internal = False, temporary = False):
+        self.location = spec
+        self.enabled = True
+        self.hit_count = 0
+        _breakpoints.append(self)
+
+    def is_valid(self):
+        return True
+
+    def delete(self):
+        _breakpoints.remove(self)
+
+def breakpoints():
+    return tuple(_breakpoints)
+
+#
+# Misc
+#
+
+frame_unwinders = []
+pretty_printers = []
+type_printers = []
+
+def execute(command, from_tty = False, to_string = False):
+    return '' if to_string else None
+
+def parse_and_eval(expression):
+    # Only integer literals are supported
+    try:
+        return Value(int(expression, 0))
+    except ValueError:
+        raise error("No symbol \"%s\" in current context." % expression)
+
+def lookup_global_symbol(name, domain = None):
+    return None
+
+def lookup_symbol(name, block = None, domain = None):
+    return (None, False)
+
+def invalidate_cached_frames():
+    pass
+
+def post_event(event):
+    event()
+
+def string_to_argv(string):
+    import shlex
+    return shlex.split(string)
+
+def write(string, stream = 0):
+    print(string, end = '')
+
+def flush(stream = 0):
+    pass
+
+STDOUT = 0
+STDERR = 1
+STDLOG = 2
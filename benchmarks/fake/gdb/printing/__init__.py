@@ -0,0 +1,19 @@
+# Copyright (c) 2022 Jan Vrany
+#
+# This program and the accompanying materials are made available under
+# the terms of the MIT license, see LICENSE file.
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Fake gdb.printing, see gdb.
+"""
+
+class PrettyPrinter(object):
+    def __init__(self, name, subprinters = None):
+        self.name = name
+        self.subprinters = subprinters
+        self.enabled = True
+
+def register_pretty_printer(obj, printer, replace = False):
+    pass
@@ -0,0 +1,25 @@
+# Copyright (c) 2022 Jan Vrany
+#
+# This program and the accompanying materials are made available under
+# the terms of the MIT license, see LICENSE file.
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Fake gdb.unwinder, see gdb.
+"""
+import gdb
+
+class Unwinder(object):
+    def __init__(self, name):
+        self.name = name
+        self.enabled = True
+
+    def __call__(self, pending_frame):
+        raise NotImplementedError("Unwinder __call__.")
+
+def register_unwinder(locus, unwinder, replace = False):
+    if locus == None:
+        locus = gdb
+    locus.frame_unwinders[:] = [u for u in locus.frame_unwinders if u.name != unwinder.name]
+    locus.frame_unwinders.insert(0, unwinder)
@@ -0,0 +1,6 @@
+# Copyright (c) 2022 Jan Vrany
+#
+# This program and the accompanying materials are made available under
+# the terms of the MIT license, see LICENSE file.
+#
+# SPDX-License-Identifier: MIT
@@ -0,0 +1,20 @@
+# Copyright (c) 2022 Jan Vrany
+#
+# This program and the accompanying materials are made available under
+# the terms of the MIT license, see LICENSE file.
+#
+# SPDX-License-Identifier: MIT
+
+import gdb
+
+U_8 = gdb.lookup_type('U_8')
+U_8_ptr = U_8.pointer()
+U_16 = gdb.lookup_type('U_16')
+U_16_ptr = U_16.pointer()
+U_32 = gdb.lookup_type('U_32')
+U_32_ptr = U_32.pointer()
+U_64 = gdb.lookup_type('U_64')
+U_64_ptr = U_64.pointer()
+I_32 = gdb.lookup_type('I_32')
+UDATA = gdb.lookup_type('UDATA')
+IDATA = gdb.lookup_type('IDATA')
@@ -0,0 +1,11 @@
+# Copyright (c) 2022 Jan Vrany
+#
+# This program and the accompanying materials are made available under
+# the terms of the MIT license, see LICENSE file.
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Fake vdb package (from jv-vdb) providing just what OpenJ9 support
+imports, see gdb.
+"""
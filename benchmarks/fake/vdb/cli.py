@@ -0,0 +1,14 @@
+# Copyright (c) 2022 Jan Vrany
+#
+# This program and the accompanying materials are made available under
+# the terms of the MIT license, see LICENSE file.
+#
+# SPDX-License-Identifier: MIT
+
+
+class __Prefixes(object):
+    def __init__(self):
+        self.prefixes = []
+
+pr = __Prefixes()
+do = __Prefixes()
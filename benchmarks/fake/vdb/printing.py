@@ -0,0 +1,22 @@
+# Copyright (c) 2022 Jan Vrany
+#
+# This program and the accompanying materials are made available under
+# the terms of the MIT license, see LICENSE file.
+#
+# SPDX-License-Identifier: MIT
+
+from gdb.printing import PrettyPrinter
+
+class CxxPrettyPrinter(PrettyPrinter):
+    def __init__(self, val):
+        self._val = val
+
+class CxxCollectionPrettyPrinter(PrettyPrinter):
+    def __init__(self, name):
+        super().__init__(name, [])
+
+    def add_printer(self, name, regexp, printer):
+        self.subprinters.append((name, regexp, printer))
+
+    def __call__(self, val):
+        return None
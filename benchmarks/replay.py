@@ -0,0 +1,185 @@
+# Copyright (c) 2022 Jan Vrany
+#
+# This program and the accompanying materials are made available under
+# the terms of the MIT license, see LICENSE file.
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Replays a record made by `jit-record` command: memory, types and
+registered methods are loaded into the fake inferior (see fake/gdb),
+then recorded Java frames are unwound with JITUnwinder and their
+methods are looked up with `lm` and `dm`. Unwound frames are checked
+against those recorded. Timings are written as JSON (see run.py).
+
+Usage:
+
+    python3 benchmarks/replay.py [-n REPEAT] [-o results.json] RECORD
+"""
+import os
+import sys
+
+_here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(_here))
+sys.path.insert(0, os.path.join(_here, 'fake'))
+sys.path.insert(0, _here)
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import time
+import gdb
+
+import openj9
+import openj9.unwinder
+
+from openj9 import record
+from openj9.cli import lm, dm
+from openj9.stats import all_stats
+from openj9.utils import MethodInfo, MethodIndex, register_methods
+from openj9.unwinder import JITUnwinder, JITHelper
+
+from run import Results
+
+class RecordedHelperTable(object):
+    """
+    JIT helpers as recorded, see JITHelperTable
+    """
+    def __init__(self, helpers):
+        self._helpers = [JITHelper(*helper) for helper in helpers]
+
+    def lookup(self, pc):
+        for helper in self._helpers:
+            if helper.start <= pc and pc < helper.end:
+                return helper
+        return None
+
+    def __iter__(self):
+        return iter(self._helpers)
+
+def _define_types(layouts, objfile):
+    """
+    Define types as recorded (see record._type_layout())
+    """
+    types = {}
+    for name, layout in layouts.items():
+        types[name] = gdb.fake_define_type(gdb.Type(name, gdb.TYPE_CODE_STRUCT, layout['size']))
+        types[name].objfile = objfile
+    for name, layout in layouts.items():
+        fields = []
+        for f in layout['fields']:
+            if f['code'] == 'int':
+                ftype = gdb.Type('int%d_t' % (f['size'] * 8), gdb.TYPE_CODE_INT, f['size'], is_signed = f['signed'])
+            elif f['code'] == 'ptr':
+                ftype = types.get(f['target']) or gdb.lookup_type('U_8')
+                ftype = ftype.pointer()
+            else:
+                ftype = gdb.Type(None, gdb.TYPE_CODE_STRUCT, f['size'])
+            fields.append(gdb.Field(f['name'], f['bitpos'], ftype, f['bitsize']))
+        types[name]._fields = fields
+    return types
+
+class Replay(object):
+    """
+    Fake inferior with memory, types and methods as recorded
+    """
+    def __init__(self, snapshot, chunks):
+        self.snapshot = snapshot
+        inferior = gdb.fake_reset(snapshot['pid'])
+        gdb.current_progspace().j9methods = MethodIndex()
+        types = _define_types(snapshot['types'], gdb.Objfile('/replay/libj9vm29.so'))
+        for addr, data in chunks:
+            inferior.memory.map(addr, len(data))[:] = data
+
+        # Set after objfiles are created as that resets both
+        progspace = gdb.current_progspace()
+        progspace.j9helpers = RecordedHelperTable(snapshot['helpers'] or [])
+        openj9.unwinder._cInterpreterAddress = snapshot['cInterpreter']
+
+        metaDataType = types['J9JITExceptionTable'].pointer()
+        self.methods = [MethodInfo(gdb.Value(method['metaData']).cast(metaDataType), bytecodeTable = method['bytecodeTable'])
+                            for method in snapshot['methods']]
+        self.frames = snapshot['frames']
+
+def replay(results, snapshot, chunks, repeat):
+    """
+    Replay record, return number of frames unwound differently
+    than recorded.
+    """
+    size = len(snapshot['methods'])
+    frames = snapshot['frames']
+    state = results.measure('replay load', size, size, Replay, snapshot, chunks)
+    results.measure('register_methods', size, size, register_methods, state.methods)
+
+    unwinder = JITUnwinder()
+    mismatched = set()
+    def unwind():
+        for i, frame in enumerate(frames):
+            ui = unwinder(gdb.PendingFrame(frame['registers']))
+            caller = frame['caller']
+            if ui == None or (caller != None and (int(ui.registers['pc']) != caller['pc'] or int(ui.registers['s11']) != caller['s11'])):
+                mismatched.add(i)
+    results.measure('unwind (cold)', len(frames), len(frames), unwind)
+    for _ in range(0, repeat):
+        results.measure('unwind (warm)', len(frames), len(frames), unwind)
+        gdb.fake_resume()
+        results.measure('unwind (after resume)', len(frames), len(frames), unwind)
+
+    pcs = [frame['registers']['pc'] for frame in frames]
+    names = []
+    def lookup_pc():
+        for pc in pcs:
+            names.extend(method.name for method in lm(pc))
+    results.measure('lm PC', len(pcs), len(pcs), lookup_pc)
+    def lookup_name():
+        for name in names:
+            lm(name, 'exact')
+    results.measure('lm -e NAME', len(names), len(names), lookup_name)
+    def dump():
+        with contextlib.redirect_stdout(io.StringIO()):
+            for pc in pcs:
+                dm.invoke('0x%x' % pc, False)
+    for _ in range(0, repeat):
+        results.measure('dm PC', len(pcs), len(pcs), dump)
+    return len(mismatched)
+
+def main(argv = sys.argv[1:]):
+    parser = argparse.ArgumentParser(description = "Replay record made by jit-record command")
+    parser.add_argument('record', help = "file written by jit-record")
+    parser.add_argument('-n', '--repeat', type = int, default = 3,
+                        help = "number of times warm benchmarks are repeated (default: %(default)s)")
+    parser.add_argument('-o', '--output', help = "write JSON results to given file instead of stdout")
+    args = parser.parse_args(argv)
+
+    snapshot, chunks = record.read(args.record)
+    if snapshot['architecture'] != 'riscv:rv64':
+        raise Exception("unsupported architecture: %s" % snapshot['architecture'])
+    results = Results()
+    mismatches = replay(results, snapshot, chunks, args.repeat)
+    if mismatches > 0:
+        sys.stderr.write("%d of %d frames unwound differently than recorded\n" % (mismatches, len(snapshot['frames'])))
+
+    report = {
+        'python' : platform.python_version(),
+        'implementation' : platform.python_implementation(),
+        'machine' : platform.machine(),
+        'timestamp' : time.time(),
+        'parameters' : vars(args),
+        'frames' : len(snapshot['frames']),
+        'memory' : sum(len(data) for _, data in chunks),
+        'mismatches' : mismatches,
+        'results' : results.results,
+        'stats' : dict((stats.name, dict(stats.counters())) for stats in all_stats()),
+    }
+    if args.output != None:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent = 2)
+    else:
+        json.dump(report, sys.stdout, indent = 2)
+        sys.stdout.write('\n')
+    return 1 if mismatches > 0 else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
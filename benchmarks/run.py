@@ -0,0 +1,256 @@
+# Copyright (c) 2022 Jan Vrany
+#
+# This program and the accompanying materials are made available under
+# the terms of the MIT license, see LICENSE file.
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Offline benchmarks of OpenJ9 support hot paths. Runs in plain CPython
+(no GDB, no inferior) using fake `gdb` module (see fake/gdb) and
+synthetic workloads (see workload.py). Results are written as JSON.
+
+Usage:
+
+    python3 benchmarks/run.py [--sizes 1000,10000,100000] [--line-entries 100,1000,10000]
+                              [--depth 1000] [--only NAME,...] [-o results.json]
+"""
+import os
+import sys
+
+_here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(_here))
+sys.path.insert(0, os.path.join(_here, 'fake'))
+sys.path.insert(0, _here)
+
+import argparse
+import json
+import platform
+import random
+import time
+import tracemalloc
+import gdb
+
+import openj9
+
+from openj9 import settings
+
+from openj9.stats import all_stats
+from openj9.utils import RangeMap, MethodMetaData, MetaDataLayout, method_index, register_methods, materialize_methods, _layout
+from openj9.runtime.util.optinfo_c import getNextLineNumberFromTable, decodeLineNumberTable
+from openj9.unwinder import JITUnwinder, JITFrameInfo, _lookup_jit_method_by_pc
+from omr.include_core.omrcomp_h import U_8_ptr
+
+from workload import Workload
+
+class Results(object):
+    """
+    Collects timings of benchmarks
+    """
+    def __init__(self):
+        self.results = []
+
+    def record(self, benchmark, size, ops, seconds):
+        self.results.append({
+            'benchmark' : benchmark,
+            'size' : size,
+            'ops' : ops,
+            'seconds' : seconds,
+            'us_per_op' : seconds * 1e6 / ops if ops > 0 else None
+        })
+        sys.stderr.write("%-40s %10d %10d ops %10.3f s %12.3f us/op\n" % (benchmark, size, ops, seconds, self.results[-1]['us_per_op'] or 0))
+
+    def measure(self, benchmark, size, ops, function, *args):
+        """
+        Call `function` with given arguments, record time it took
+        to perform `ops` operations and return its result.
+        """
+        start = time.perf_counter()
+        result = function(*args)
+        self.record(benchmark, size, ops, time.perf_counter() - start)
+        return result
+
+    def annotate(self, **values):
+        """
+        Add given values to the most recent result
+        """
+        self.results[-1].update(values)
+
+def bench_rangemap(results, size, rng):
+    mapping = [(0x100000 + 4 * i, i) for i in range(0, size)]
+    rangeMap = results.measure('RangeMap build', size, size, RangeMap, mapping)
+    keys = [rng.randrange(0x100000, 0x100000 + 4 * size) for _ in range(0, min(size, 100000))]
+    def lookup():
+        for key in keys:
+            rangeMap[key]
+    results.measure('RangeMap lookup', size, len(keys), lookup)
+
+def bench_methods(results, size, depth, rng):
+    workload = results.measure('workload build', size, size, Workload, size)
+    methods = workload.methods
+    results.measure('register_methods', size, size, register_methods, methods)
+
+    # Metadata snapshot (single raw read) vs. gdb.Value field access,
+    # both with cold memory cache
+    metaDataVals = [method._metaDataVal for method in methods]
+    layout = _layout(metaDataVals[0].type, MetaDataLayout)
+    def metadata_value():
+        return [MethodMetaData.fromValue(metaDataVal) for metaDataVal in metaDataVals]
+    def metadata_layout():
+        return [layout.metaData(int(metaDataVal)) for metaDataVal in metaDataVals]
+    def fields(metaData):
+        return tuple(getattr(metaData, name) for name in MethodMetaData.__slots__)
+    gdb.fake_resume()
+    expected = results.measure('MethodMetaData.fromValue', size, size, metadata_value)
+    gdb.fake_resume()
+    actual = results.measure('MetaDataLayout.metaData', size, size, metadata_layout)
+    assert [fields(m) for m in actual] == [fields(m) for m in expected]
+
+    pcs = [workload.pc(rng.randrange(0, size), rng.randrange(0, workload.lineEntries)) for _ in range(0, min(size, 100000))]
+    def lookup():
+        for pc in pcs:
+            assert _lookup_jit_method_by_pc(pc) != None
+    results.measure('_lookup_jit_method_by_pc', size, len(pcs), lookup)
+
+    names = [methods[rng.randrange(0, size)].name for _ in range(0, 1000)]
+    index = method_index()
+    results.measure('name index build (first search)', size, 1, index.names.exact, names[0])
+    def exact():
+        for name in names:
+            assert len(index.names.exact(name)) == 1
+    results.measure('name search (exact)', size, len(names), exact)
+    def prefix():
+        for name in names:
+            index.names.prefix(name[:name.rindex('/')])
+    results.measure('name search (prefix)', size, len(names), prefix)
+    def regex():
+        for name in names[:10]:
+            index.names.regex(r'Class%s\.' % name[name.rindex('Class') + 5:name.rindex('.')])
+    results.measure('name search (regexp)', size, 10, regex)
+
+    frames = workload.stack(depth)
+    unwinder = JITUnwinder()
+    def unwind():
+        for n in range(0, depth):
+            ui = unwinder(gdb.PendingFrame(frames[n]))
+            if n + 1 < depth:
+                assert int(ui.registers['pc']) == frames[n + 1]['pc']
+                assert int(ui.registers['s11']) == frames[n + 1]['s11']
+    results.measure('unwind (cold)', size, depth, unwind)
+    results.measure('unwind (warm)', size, depth, unwind)
+    gdb.fake_resume()
+    results.measure('unwind (after resume)', size, depth, unwind)
+
+    gdb.fake_resume()
+    infos = [(JITFrameInfo(frame['pc']), gdb.PendingFrame(frame)) for frame in frames]
+    def create_unwind_info():
+        for info, pendingFrame in infos:
+            info.create_unwind_info(pendingFrame)
+    results.measure('JITFrameInfo.create_unwind_info', size, depth, create_unwind_info)
+
+def bench_materialize(results, size, grouping):
+    """
+    Materialize all methods with given `set openj9 symtab-grouping`,
+    recording time, number of objfiles and compunits created and memory
+    allocated (by Python) for them.
+    """
+    saved = (settings.symtab_grouping.value, settings.lazy_symtabs.value)
+    settings.symtab_grouping.value = grouping
+    settings.lazy_symtabs.value = True
+    try:
+        for traced in (False, True):
+            workload = Workload(size)
+            methods = workload.methods
+            register_methods(methods)
+            objfiles = len(gdb.objfiles())
+            if traced:
+                tracemalloc.start()
+                materialize_methods(methods)
+                allocated, _ = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+            else:
+                results.measure('materialize_methods (%s)' % grouping, size, size, materialize_methods, methods)
+        # Each objfile has exactly one compunit, see _materialize_group()
+        created = len(gdb.objfiles()) - objfiles
+        results.annotate(objfiles = created, compunits = created, bytes_allocated = allocated)
+        sys.stderr.write("%-40s %10d %10d objfiles %10d compunits %10d bytes\n" % ('', size, created, created, allocated))
+    finally:
+        settings.symtab_grouping.value, settings.lazy_symtabs.value = saved
+
+def bench_linetables(results, entries, count = 64):
+    workload = Workload(count, entries)
+    methods = workload.methods
+    def linetables():
+        for method in methods:
+            assert len(method.linetable()) > 0
+    results.measure('MethodInfo.linetable (cold)', entries, count, linetables)
+    results.measure('MethodInfo.linetable (warm)', entries, count, linetables)
+
+    address, lineCount, tableSize = workload.lineNumberTable(0)
+    def decode_value():
+        entries = []
+        ptr = gdb.Value(address).cast(U_8_ptr)
+        line = 0
+        location = 0
+        for _ in range(0, lineCount):
+            ptr, (line, location) = getNextLineNumberFromTable(ptr, line, location)
+            entries.append((line, location))
+        return entries
+    def decode_raw():
+        table = bytes(workload.inferior.read_memory(address, tableSize))
+        return list(decodeLineNumberTable(table, lineCount))
+    expected = results.measure('getNextLineNumberFromTable', entries, lineCount, decode_value)
+    assert results.measure('decodeLineNumberTable', entries, lineCount, decode_raw) == expected
+
+def main(argv = sys.argv[1:]):
+    parser = argparse.ArgumentParser(description = "Run offline benchmarks of OpenJ9 support")
+    parser.add_argument('--sizes', default = '1000,10000,100000',
+                        help = "comma-separated numbers of compiled methods (default: %(default)s)")
+    parser.add_argument('--line-entries', default = '100,1000,10000',
+                        help = "comma-separated numbers of line table entries (default: %(default)s)")
+    parser.add_argument('--depth', type = int, default = 1000,
+                        help = "depth of Java stack to unwind (default: %(default)s)")
+    parser.add_argument('--only', default = 'rangemap,methods,materialize,linetables',
+                        help = "comma-separated benchmark groups to run (default: %(default)s)")
+    parser.add_argument('--seed', type = int, default = 0)
+    parser.add_argument('-o', '--output', help = "write JSON results to given file instead of stdout")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    lineEntries = [int(entries) for entries in args.line_entries.split(',') if entries]
+    groups = args.only.split(',')
+    rng = random.Random(args.seed)
+
+    results = Results()
+    if 'rangemap' in groups:
+        for size in sizes:
+            bench_rangemap(results, size, rng)
+    if 'methods' in groups:
+        for size in sizes:
+            bench_methods(results, size, args.depth, rng)
+    if 'materialize' in groups:
+        for size in sizes:
+            for grouping in ('method', 'batch', 'segment'):
+                bench_materialize(results, size, grouping)
+    if 'linetables' in groups:
+        for entries in lineEntries:
+            bench_linetables(results, entries)
+
+    report = {
+        'python' : platform.python_version(),
+        'implementation' : platform.python_implementation(),
+        'machine' : platform.machine(),
+        'timestamp' : time.time(),
+        'parameters' : vars(args),
+        'results' : results.results,
+        'stats' : dict((stats.name, dict(stats.counters())) for stats in all_stats()),
+    }
+    if args.output != None:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent = 2)
+    else:
+        json.dump(report, sys.stdout, indent = 2)
+        sys.stdout.write('\n')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,306 @@
+# Copyright (c) 2022 Jan Vrany
+#
+# This program and the accompanying materials are made available under
+# the terms of the MIT license, see LICENSE file.
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Synthetic workloads for benchmarks. A Workload populates memory of
+the fake inferior (see fake/gdb) with J9 structures of given number of
+compiled methods - names, ROM methods with (compressed) line number
+tables, RAM methods, metadata and RISC-V code - as laid out by OpenJ9,
+and creates MethodInfo for each of them. It can also build a (deep)
+Java stack of these methods.
+
+Only fields actually read by OpenJ9 support are defined and filled in.
+"""
+import struct
+import gdb
+
+from array import array
+
+from openj9.utils import MethodInfo, MethodIndex
+from openj9.runtime.oti.j9javaaccessflags_h import J9Acc
+
+PAGE_SIZE = 4096
+
+# Base addresses of memory regions of fake inferior
+UTF8_BASE = 0x0000001000000000
+ROM_BASE  = 0x0000002000000000
+RAM_BASE  = 0x0000003000000000
+META_BASE = 0x0000004000000000
+CODE_BASE = 0x0000005000000000
+STACK_BASE= 0x0000006000000000
+
+# Size of fake J9JITExceptionTable, only fields up to `slots`
+# are defined.
+METADATA_SIZE = 88
+ROM_METHOD_SIZE = 20
+RAM_METHOD_SIZE = 32
+DEBUG_INFO_SIZE = 12
+
+SIGNATURES = ('()V', '(I)I', '(J)J', '(Ljava/lang/String;)V', '(Ljava/lang/Object;I)Ljava/lang/Object;')
+
+def _page_align(size):
+    return (size + PAGE_SIZE - 1) & ~(PAGE_SIZE - 1)
+
+def _align(value, alignment):
+    return (value + alignment - 1) & ~(alignment - 1)
+
+#
+# RISC-V instructions used in generated code, see
+# JITFrameInfo._compute_unwind_regs() for the expected shape
+# of prologue and epilogue.
+#
+_RA = 1
+_S10 = 26
+_S11 = 27
+_T3 = 28
+_A0 = 10
+
+def _i_type(opcode, funct3, rd, rs1, imm):
+    return ((imm & 0xFFF) << 20) | (rs1 << 15) | (funct3 << 12) | (rd << 7) | opcode
+
+def _s_type(opcode, funct3, rs1, rs2, imm):
+    return (((imm >> 5) & 0x7F) << 25) | (rs2 << 20) | (rs1 << 15) | (funct3 << 12) | ((imm & 0x1F) << 7) | opcode
+
+NOP = _i_type(0x13, 0, 0, 0, 0)
+RET = 0x00008067
+
+def _ld(rd, rs1, imm):
+    return _i_type(0x03, 3, rd, rs1, imm)
+
+def _sd(rs2, rs1, imm):
+    return _s_type(0x23, 3, rs1, rs2, imm)
+
+def _addi(rd, rs1, imm):
+    return _i_type(0x13, 0, rd, rs1, imm)
+
+def _blt(rs1, rs2):
+    # Branch offset is irrelevant for unwinder, leave it zero.
+    return (rs2 << 20) | (rs1 << 15) | (4 << 12) | 0x63
+
+def define_types():
+    """
+    Define (fake) J9 types needed by OpenJ9 support. Types are
+    associated with a (fake) libj9vm29.so objfile so layouts
+    derived from them are cached as they would be in GDB.
+    """
+    objfile = gdb.Objfile('/opt/openj9/lib/default/libj9vm29.so')
+    U_8 = gdb.lookup_type('U_8')
+    U_16 = gdb.lookup_type('U_16')
+    U_32 = gdb.lookup_type('U_32')
+    I_16 = gdb.lookup_type('I_16')
+    I_32 = gdb.lookup_type('I_32')
+    UDATA = gdb.lookup_type('UDATA')
+
+    types = {}
+    def define(name, size, fields):
+        type = gdb.fake_struct_type(name, size, fields)
+        type.objfile = objfile
+        types[name] = type
+        return type
+
+    utf8 = define('J9UTF8', 4, [('length', 0, U_16), ('data', 2, U_8)])
+    define('J9ROMMethod', ROM_METHOD_SIZE,
+           [('nameAndSignature', 0, I_32), ('modifiers', 8, U_32),
+            ('maxStack', 12, U_16), ('bytecodeSizeLow', 14, U_16),
+            ('bytecodeSizeHigh', 16, U_8), ('argCount', 17, U_8),
+            ('tempCount', 18, U_16)])
+    define('J9MethodDebugInfo', DEBUG_INFO_SIZE,
+           [('srpToVarInfo', 0, I_32), ('lineNumberCount', 4, U_32), ('varInfoCount', 8, U_32)])
+    define('J9ExceptionInfo', 4, [('catchCount', 0, U_16), ('throwCount', 2, U_16)])
+    define('J9ExceptionHandler', 16,
+           [('startPC', 0, U_32), ('endPC', 4, U_32),
+            ('handlerPC', 8, U_32), ('exceptionClassIndex', 12, U_32)])
+    ramMethod = define('J9Method', RAM_METHOD_SIZE,
+                       [('bytecodes', 0, U_8.pointer()), ('constantPool', 8, UDATA),
+                        ('methodRunAddress', 16, UDATA), ('extra', 24, UDATA)])
+    define('J9JITExceptionTable', METADATA_SIZE,
+           [('className', 0, utf8.pointer()), ('methodSignature', 8, utf8.pointer()),
+            ('methodName', 16, utf8.pointer()), ('constantPool', 24, UDATA),
+            ('ramMethod', 32, ramMethod.pointer()), ('startPC', 40, UDATA),
+            ('endWarmPC', 48, UDATA), ('startColdPC', 56, UDATA),
+            ('endPC', 64, UDATA), ('totalFrameSize', 72, UDATA),
+            ('slots', 80, I_16)])
+    return types
+
+def _line_number_table(count):
+    """
+    Return compressed line number table with `count` entries (see
+    getNextLineNumberFromTable()). Entries are mostly 1-byte encoded
+    (location + 2, line + 1), every 8th is 2-byte encoded going a few
+    lines back (as in a loop), every 64th is 3-byte encoded and every
+    512th is 5-byte encoded, alternately jumping far forward and back.
+    """
+    table = bytearray()
+    for k in range(0, count):
+        if k == 0:
+            table.append(0x01)                                  # location 0, line 1
+        elif k % 512 == 0:
+            line = 5000 if (k // 512) % 2 == 1 else -5000
+            table.extend((0xE0 << 32 | 2 << 17 | (line & 0x1FFFF)).to_bytes(5, 'big'))
+        elif k % 64 == 0:
+            table.extend((0xC0 << 16 | 2 << 13 | 300).to_bytes(3, 'big'))
+        elif k % 8 == 0:
+            table.extend((0x80 << 8 | 2 << 9 | (-3 & 0x1FF)).to_bytes(2, 'big'))
+        else:
+            table.append(2 << 2 | 1)
+    return bytes(table)
+
+class Workload(object):
+    """
+    Fake inferior with `count` compiled methods, each with `lineEntries`
+    entries in its line number table and one instruction per entry
+    in its body.
+    """
+    def __init__(self, count, lineEntries = 8):
+        self.count = count
+        self.lineEntries = lineEntries
+        self.inferior = gdb.fake_reset()
+        gdb.current_progspace().j9methods = MethodIndex()
+        self.types = define_types()
+
+        memory = self.inferior.memory
+        nclasses = max(1, count // 16)
+        lineTable = _line_number_table(lineEntries)
+        bytecodeSize = 2 * lineEntries
+
+        # Names
+        utf8 = bytearray()
+        def intern(string):
+            addr = UTF8_BASE + len(utf8)
+            data = string.encode()
+            utf8.extend(struct.pack('<H', len(data)))
+            utf8.extend(data)
+            if len(utf8) % 2:
+                utf8.append(0)
+            return addr
+        classNames = [intern('bench/pkg%d/Class%d' % (c % 97, c)) for c in range(0, nclasses)]
+        signatures = [intern(signature) for signature in SIGNATURES]
+        methodNames = [intern('method%d' % i) for i in range(0, count)]
+        memory.map(UTF8_BASE, _page_align(len(utf8)))[:len(utf8)] = utf8
+
+        # ROM methods followed by bytecodes and debug info with
+        # line number table
+        if lineEntries <= 0x7FFF and len(lineTable) <= 0xFFFF:
+            debugInfo = struct.pack('<iII', 0, (lineEntries << 1) | (len(lineTable) << 16), 0)
+        else:
+            debugInfo = struct.pack('<iIII', 0, (lineEntries << 1) | 1, 0, len(lineTable))
+        romMethodSize = _align(ROM_METHOD_SIZE + _align(bytecodeSize, 4) + len(debugInfo) + len(lineTable), 8)
+        romMethod = bytearray(romMethodSize)
+        struct.pack_into('<iiIHHBBH', romMethod, 0, 0, 0, J9Acc.MethodHasDebugInfo, 4,
+                         bytecodeSize & 0xFFFF, bytecodeSize >> 16, 1, 0)
+        self.lineNumberTableSize = len(lineTable)
+        self.lineNumberTableOffset = ROM_METHOD_SIZE + _align(bytecodeSize, 4) + len(debugInfo)
+        romMethod[self.lineNumberTableOffset - len(debugInfo):self.lineNumberTableOffset] = debugInfo
+        romMethod[self.lineNumberTableOffset:self.lineNumberTableOffset + len(lineTable)] = lineTable
+        roms = memory.map(ROM_BASE, _page_align(count * romMethodSize))
+        roms[:count * romMethodSize] = bytes(romMethod) * count
+        self.romMethodSize = romMethodSize
+
+        # RAM methods, methods' code and metadata
+        rams = memory.map(RAM_BASE, _page_align(count * RAM_METHOD_SIZE))
+        metas = memory.map(META_BASE, _page_align(count * METADATA_SIZE))
+        codeSizes = [self._code_size(i) for i in range(0, count)]
+        code = memory.map(CODE_BASE, _page_align(sum(_align(size, 16) + 16 for size in codeSizes)))
+        ramMethod = struct.Struct('<QQQQ')
+        metaData = struct.Struct('<QQQQQQQQQQh')
+        pcs = array('Q')
+        self.bodyStarts = pcs
+        offset = 0
+        for i in range(0, count):
+            rom = ROM_BASE + i * romMethodSize
+            ram = RAM_BASE + i * RAM_METHOD_SIZE
+            ramMethod.pack_into(rams, i * RAM_METHOD_SIZE, rom + ROM_METHOD_SIZE, 0, 0, 0)
+            startPC = CODE_BASE + offset
+            bodyStart = self._emit_code(i, code, offset)
+            pcs.append(bodyStart)
+            endPC = startPC + codeSizes[i]
+            metaData.pack_into(metas, i * METADATA_SIZE, classNames[i % nclasses], signatures[i % len(signatures)],
+                               methodNames[i], 0, ram, startPC, endPC, 0, endPC,
+                               self.totalFrameSize(i), self.slots(i))
+            offset = offset + _align(codeSizes[i], 16) + 16
+
+        metaDataType = self.types['J9JITExceptionTable'].pointer()
+        self.methods = []
+        for i in range(0, count):
+            startPC = pcs[i] - 16 - 4 * self.slots(i)
+            bytecodeTable = [(startPC, 0)]
+            bytecodeTable.extend((pcs[i] + 4 * k, 2 * k) for k in range(1, lineEntries))
+            self.methods.append(MethodInfo(gdb.Value(META_BASE + i * METADATA_SIZE).cast(metaDataType),
+                                           bytecodeTable = bytecodeTable))
+
+    @staticmethod
+    def slots(i):
+        """
+        Number of parameter slots of i-th method
+        """
+        return i % 3
+
+    @staticmethod
+    def totalFrameSize(i):
+        """
+        Number of frame slots (including return address)
+        of i-th method
+        """
+        return 2 + i % 4
+
+    def _code_size(self, i):
+        # Parameter loads, prologue, body and epilogue
+        return 4 * (self.slots(i) + 4 + self.lineEntries + 3)
+
+    def _emit_code(self, i, code, offset):
+        """
+        Emit code of i-th method at given offset in code region.
+        Return address of the first instruction of method's body.
+        """
+        frameSize = self.totalFrameSize(i) * 8 + 8
+        insns = [_ld(_A0 + k, _S11, k * 8) for k in range(0, self.slots(i))]
+        insns.append(_sd(_RA, _S11, -8))             # jitEntry
+        insns.append(_addi(_S11, _S11, -frameSize))
+        insns.append(_ld(_T3, _S10, 80))
+        insns.append(_blt(_S11, _T3))
+        bodyStart = CODE_BASE + offset + 4 * len(insns)
+        insns.extend([NOP] * self.lineEntries)
+        insns.append(_addi(_S11, _S11, frameSize))
+        insns.append(_ld(_RA, _S11, -8))
+        insns.append(RET)
+        struct.pack_into('<%dI' % len(insns), code, offset, *insns)
+        return bodyStart
+
+    def pc(self, i, k = 0):
+        """
+        Return PC of k-th instruction in body of i-th method
+        """
+        return self.bodyStarts[i] + 4 * (k % self.lineEntries)
+
+    def lineNumberTable(self, i):
+        """
+        Return (address, count, size in bytes) of compressed
+        line number table of i-th method
+        """
+        return (ROM_BASE + i * self.romMethodSize + self.lineNumberTableOffset, self.lineEntries, self.lineNumberTableSize)
+
+    def stack(self, depth):
+        """
+        Build a Java stack of `depth` frames of compiled methods in
+        fake inferior's memory. Return a list of registers of frames
+        (innermost first) as passed to PendingFrame.
+        """
+        chain = [((k * 7919) % self.count, k) for k in range(0, depth)]
+        sizes = [self.totalFrameSize(i) * 8 + 8 for i, _ in chain]
+        stack = self.inferior.memory.map(STACK_BASE, _page_align(sum(sizes) + 8))
+        frames = []
+        s11 = STACK_BASE
+        for n in range(0, depth):
+            i, k = chain[n]
+            if n + 1 < depth:
+                ra = self.pc(*chain[n + 1])
+            else:
+                ra = 0
+            struct.pack_into('<Q', stack, s11 - STACK_BASE + self.totalFrameSize(i) * 8, ra)
+            frames.append({ 'pc' : self.pc(i, k), 's11' : s11, 'ra' : 0, 'sp' : 0x7ffff000 })
+            s11 = s11 + sizes[n]
+        return frames
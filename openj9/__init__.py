@@ -1,29 +1,125 @@
+import re
 import sys
 import gdb
 import omr
+import openj9.settings
 import openj9.printing
 import openj9.unwinder
 import openj9.cli
 
+from collections import deque
 from vdb.cli import pr, do
 
-from openj9.utils import MethodInfo
-from openj9.cli import uw, lm, dm, di
+from openj9 import events
+from openj9 import memory
+from openj9 import perf
+from openj9 import utils
+
+from openj9.utils import MethodInfo, register_methods, unregister_method
+from openj9.stats import Stats
+from openj9.cli import uw, lm, dm, di, jit_stats, jit_scan, jit_export_perf, jprofile, jit_record
 
 pr.prefixes.append('openj9')
 
+_stats = Stats('MethodInfoRegistrar')
+
+# Methods captured by MethodInfoRegistrar but not yet registered,
+# see `set openj9 registrar-mode`
+_pending = deque()
+
+def _register_pending(event = None):
+    """
+    Register all methods captured so far. Does nothing if the inferior
+    is running as its memory cannot be read. In that case, the methods
+    are registered once it stops.
+    """
+    if len(_pending) == 0:
+        return
+    thread = gdb.selected_thread()
+    if thread != None and thread.is_running():
+        return
+    _drain_pending()
+
+def _drain_pending():
+    """
+    Register all methods captured so far. Must only be called when
+    inferior's memory can be read, i.e., when stopped or from
+    breakpoint's stop() (where threads still appear to be running).
+    """
+    with _stats.timed('registration (batch)'):
+        methods = list(_pending)
+        _pending.clear()
+        register_methods(methods)
+        perf.export_registered(methods)
+
+events.connect('stop', _register_pending)
+
+def _clear_caches():
+    """
+    Clear caches of inferior's memory and of data decoded from it. GDB
+    does not emit `cont` event when it resumes the inferior after
+    breakpoint's stop() returns False so the caches must be cleared
+    explicitly whenever internal breakpoints below are hit.
+    """
+    memory._clear()
+    utils._j9utf8_cache_clear()
+    utils._code_cache_segments_clear()
+    openj9.unwinder._unwind_cache_clear()
+
 class MethodInfoRegistrar(gdb.Breakpoint):
     def __init__(self):
         super().__init__("TR::CompilationInfoPerThreadBase::logCompilationSuccess", internal=False)
 
+    def _should_stop(self, methodInfo):
+        mode = openj9.settings.registrar_mode.value
+        if mode == 'stop-always':
+            return True
+        elif mode == 'stop-on-match':
+            regexp = openj9.settings.registrar_stop_regexp.value
+            return regexp != None and regexp != '' and re.search(regexp, methodInfo.name) != None
+        else:
+            return False
+
     def stop(self):
-        metaData = gdb.newest_frame().read_var('metaData')
-        compiler = gdb.newest_frame().read_var('compiler')
+        _clear_caches()
+        with _stats.timed('capture'):
+            metaData = gdb.newest_frame().read_var('metaData')
+            metaData.fetch_lazy()
+            compiler = gdb.newest_frame().read_var('compiler')
+
+            # This extracts the PC-to-bytecode table (the only data
+            # that does not survive the compilation).
+            methodInfo = MethodInfo(metaData, compiler)
+            methodInfo.loadTimestamp = perf.timestamp()
 
-        methodInfo = MethodInfo(metaData, compiler)
-        methodInfo.registerCompiled()
+        _pending.append(methodInfo)
+        if self._should_stop(methodInfo):
+            _drain_pending()
+            return True # Stop
+        if len(_pending) >= openj9.settings.registrar_batch_size.value:
+            _drain_pending()
+        return False # Do not stop
 
-        return True # Stop
+class MethodInfoUnregistrar(gdb.Breakpoint):
+    """
+    Unregisters compiled methods when their metadata is removed from JIT
+    artifacts, i.e., when their code is reclaimed or invalidated.
+    Never stops.
+    """
+    def __init__(self):
+        super().__init__("hash_jit_artifact_remove", internal=False)
+
+    def stop(self):
+        _clear_caches()
+        with _stats.timed('unregistration'):
+            dataToDelete = int(gdb.newest_frame().read_var('dataToDelete'))
+            # Method being removed may still be pending, drop it
+            # so it is not registered as live later.
+            for methodInfo in list(_pending):
+                if int(methodInfo._metaDataVal) == dataToDelete:
+                    _pending.remove(methodInfo)
+            unregister_method(dataToDelete)
+        return False # Do not stop
 
 # Install MethodInfoRegistrar if not already installed.
 __registrar = None
@@ -33,5 +129,13 @@ for bp in gdb.breakpoints():
 if __registrar == None:
     __registrar = MethodInfoRegistrar()
 
+# Install MethodInfoUnregistrar if not already installed.
+__unregistrar = None
+for bp in gdb.breakpoints():
+    if bp.__class__.__name__ == 'MethodInfoUnregistrar':
+        __unregistrar = bp
+if __unregistrar == None:
+    __unregistrar = MethodInfoUnregistrar()
+
 
 
@@ -10,6 +10,15 @@ OpenJ9 specific commands
 """
 import gdb
 import re
+import time
+
+from openj9.utils import MethodInfo, RangeMap, method_index, register_methods, materialize_methods, instructions
+from openj9.runtime.codert_vm.jithash_c import jit_artifacts
+from openj9.runtime.types import pointer_type
+from openj9.stats import all_stats
+from openj9 import perf
+from openj9 import record
+from openj9.profiler import Profiler
 
 class __Unwind(gdb.Command):
     """
@@ -63,64 +72,103 @@ uw = __Unwind()
 
 class __LookupMethod(gdb.Command):
     """
-    Looks up a method containing given PC or matching given REGEXP.
-    Usage: ls [PC]
-           ls REGEXP
+    Looks up a method containing given PC or methods matching given PATTERN.
+    Usage: lm [PC]
+           lm [-e|-p|-g|-r] [-n COUNT] [-s SKIP] PATTERN
 
     PC can be given as an expression evaluating to an address
     or omitted in which case value if $pc (PC of currently
     selected frame) is used.
 
-    If REGEXP is given, all methods whose name matches
-    given regexp are looked up and printed.
+    If PATTERN is given, all methods whose name matches it are looked
+    up and printed, sorted by name. PATTERN is
+
+      -e  exact name of the method (with or without signature)
+      -p  prefix of method's name
+      -g  shell-style glob matched against method's name
+      -r  regexp searched in method's name (the default)
+
+    At most COUNT methods (100 by default, 0 means all) are printed,
+    skipping first SKIP methods.
     """
     def __init__(self, name = 'lm'):
         super().__init__(name, gdb.COMMAND_DATA)
+        self._name = name
 
     def _dump1(self, method):
-        print("0x%016x - 0x%016x '%s'" % (method.startPC, method.endPC, method.name))
+        versions = method_index().versions(method.metaData.ramMethod)
+        if len(versions) > 1:
+            print("0x%016x - 0x%016x '%s' (version %d of %d)" % (method.startPC, method.endPC, method.name, versions.index(method) + 1, len(versions)))
+        else:
+            print("0x%016x - 0x%016x '%s'" % (method.startPC, method.endPC, method.name))
+
+    _kinds = { '-e' : 'exact', '-p' : 'prefix', '-g' : 'glob', '-r' : 'regex' }
 
     def invoke(self, args, from_tty):
         argv = gdb.string_to_argv(args)
+        kind = None
+        count = 100
+        skip = 0
+        while len(argv) > 0 and argv[0] in ('-e', '-p', '-g', '-r', '-n', '-s'):
+            option = argv.pop(0)
+            if option in self._kinds:
+                kind = self._kinds[option]
+            elif len(argv) == 0:
+                raise Exception("option %s requires an argument" % option)
+            elif option == '-n':
+                count = int(argv.pop(0))
+            else:
+                skip = int(argv.pop(0))
         if len(argv) > 1:
-            raise Exception("lm takes only one argument (%d given)" % len(argv))
+            raise Exception("%s takes only one argument (%d given)" % (self._name, len(argv)))
         elif len(argv) == 0:
+            if kind != None:
+                raise Exception("%s requires a PATTERN" % self._name)
             argv = ['$pc']
-        any_found = False
-        for method in self(argv[0]):
-            any_found = True
+        methods = self(argv[0], kind)
+        total = len(methods)
+        if count != 0:
+            methods = methods[skip:skip + count]
+        else:
+            methods = methods[skip:]
+        # Once looked up, make methods known to GDB so
+        # one can place breakpoints, list them and so on.
+        materialize_methods(methods)
+        for method in methods:
             self._dump1(method)
-        if not any_found:
+        if total == 0:
             print("No method found.")
-
-    def __call__(self, pc_or_regexp = '$pc'):
+        elif skip + len(methods) < total:
+            print("(%d of %d methods shown, use -s %d to see more)" % (len(methods), total, skip + len(methods)))
+
+    def __call__(self, pc_or_pattern = '$pc', kind = None):
+        """
+        Return a list of methods containing given PC or matching given
+        pattern. `kind` is one of 'exact', 'prefix', 'glob' or 'regex'.
+        If `kind` is None, `pc_or_pattern` is first tried as PC and then
+        as a regexp.
+        """
         pc = None
-        regexp = None
-        try:
-            pc = None
-            if isinstance(pc_or_regexp, int):
-                pc = pc_or_regexp
-            elif isinstance(pc_or_regexp, gdb.Value):
-                pc = int(pc)
-            elif isinstance(pc_or_regexp, str):
-                pc = gdb.parse_and_eval(pc_or_regexp)
-            else:
-                raise InvalidArgument("pc_or_regexp must be an int, str, or gdb.Value")
-        except:
-            regexp = re.compile(pc_or_regexp)
-
-        def matches(method):
-            if pc != None:
-                return  method.startPC <= pc and pc <= method.endPC
-            elif regexp != None:
-                return regexp.search(method.name)
-            else:
-                return True
-
-        methods = (getattr(objf, 'j9method') for objf in gdb.objfiles() if hasattr(objf, 'j9method'))
-        matching = [method for method in methods if matches(method)]
+        if kind == None:
+            try:
+                if isinstance(pc_or_pattern, int):
+                    pc = pc_or_pattern
+                elif isinstance(pc_or_pattern, gdb.Value):
+                    pc = int(pc_or_pattern)
+                elif isinstance(pc_or_pattern, str):
+                    pc = int(gdb.parse_and_eval(pc_or_pattern))
+                else:
+                    raise TypeError("pc_or_pattern must be an int, str, or gdb.Value")
+            except:
+                kind = 'regex'
 
-        return matching
+        methods = method_index()
+        if pc != None:
+            method = methods.lookup(pc)
+            if method != None:
+                return [method]
+            return []
+        return getattr(methods.names, kind)(pc_or_pattern)
 
 lm = __LookupMethod()
 
@@ -153,39 +201,301 @@ class __DumpMethods(__LookupMethod):
 dm = __DumpMethods()
 
 class __DumpInstructions(gdb.Command):
+    """
+    Dumps instructions of the method being compiled along with IL nodes
+    they have been generated for.
+    Usage: di [-r START END] [-i REGEXP]
+
+    Must be used in a frame where `compiler` is visible.
+
+    If -r is given, only instructions at PC in range [START, END) are
+    dumped. START and END are expressions evaluating to an address.
+    If -i is given, only instructions whose IL node matches REGEXP are
+    dumped.
+    """
+
+    # Instructions closer than this (in bytes) are disassembled together.
+    _MAX_GAP = 256
+
     def __init__(self):
         super().__init__('di', gdb.COMMAND_DATA)
 
     def invoke(self, args, from_tty):
         argv = gdb.string_to_argv(args)
-        if len(argv) != 0:
-            raise Exception("di takes no arguments (%d given)" % len(argv))
-        self()
+        start = None
+        end = None
+        il = None
+        while len(argv) > 0:
+            option = argv.pop(0)
+            if option == '-r' and len(argv) >= 2:
+                start = int(gdb.parse_and_eval(argv.pop(0)))
+                end = int(gdb.parse_and_eval(argv.pop(0)))
+            elif option == '-i' and len(argv) >= 1:
+                il = re.compile(argv.pop(0))
+            else:
+                raise Exception("usage: di [-r START END] [-i REGEXP]")
+        self(start, end, il)
 
-    def _dump1(self, insn):
-        pc = int(insn['_binaryEncodingBuffer'])
-        sz = int(insn['_binaryLength'])
+    @staticmethod
+    def _shorten(string, maxlen):
+        if len(string) > maxlen:
+            return string[0:maxlen-3].replace('\t', ' ') + '...'
+        else:
+            return string.replace('\t', ' ')
+
+    def _runs(self, insns):
+        """
+        Split given instructions (in order) into runs of instructions
+        close enough to each other to be disassembled together.
+        """
+        run = []
+        for insn in insns:
+            pc, sz, _ = insn
+            if len(run) > 0 and (pc < runStart or runEnd + self._MAX_GAP < pc):
+                yield run, runStart, runEnd
+                run = []
+            if len(run) == 0:
+                runStart = pc
+                runEnd = pc + sz
+            run.append(insn)
+            runEnd = max(runEnd, pc + sz)
+        if len(run) > 0:
+            yield run, runStart, runEnd
+
+    def _disassemble(self, runStart, runEnd):
+        """
+        Disassemble code in range [runStart, runEnd) and return a dictionary
+        mapping PC to disassembled instruction.
+        """
+        arch = gdb.selected_inferior().architecture()
+        return dict((insn['addr'], insn['asm']) for insn in arch.disassemble(runStart, runEnd - 1))
+
+    def __call__(self, start = None, end = None, il = None):
+        comp = gdb.selected_frame().read_var('compiler')
+        firstInsn = comp['_codeGenerator']['_firstInstruction']
+        nodeType = firstInsn['_node'].type
+
+        insns = instructions(firstInsn)
+        if start != None:
+            insns = [insn for insn in insns if start <= insn[0] and insn[0] < end]
+
+        # Rendered nodes keyed by their address. Many instructions
+        # are usually generated for a single node.
+        nodes = {}
+        def render(node):
+            rendered = nodes.get(node)
+            if rendered == None:
+                nodeVal = gdb.Value(node).cast(nodeType)
+                visualizer = gdb.default_visualizer(nodeVal)
+                rendered = visualizer.to_string() if visualizer != None else str(nodeVal)
+                nodes[node] = rendered
+            return rendered
+
+        # Filter first so only instructions to be dumped are disassembled.
+        if il != None:
+            insns = [insn for insn in insns if il.search(render(insn[2]))]
+
+        # Disassemble and print run by run so output appears as soon as
+        # possible.
+        for run, runStart, runEnd in self._runs(insns):
+            disassembly = self._disassemble(runStart, runEnd)
+            for pc, sz, node in run:
+                asm = disassembly.get(pc)
+                if asm == None:
+                    asm = gdb.selected_inferior().architecture().disassemble(pc)[0]['asm']
+                print("0x%016x  %-30s IL %s" %( pc, self._shorten(asm, 30), render(node)))
 
-        if sz > 0:
-            node = insn['_node']
+di = __DumpInstructions()
 
-            disassmInfo = gdb.selected_inferior().architecture().disassemble(pc)
+class __JITStats(gdb.Command):
+    """
+    Print counters and timers collected by OpenJ9 support.
+    Usage: jit-stats [reset]
 
-            def shorten(string, maxlen):
-                if len(string) > maxlen:
-                    return string[0:maxlen-3].replace('\t', ' ') + '...'
-                else:
-                    return string.replace('\t', ' ')
+    If `reset` is given, all counters and timers are reset.
+    """
+    def __init__(self):
+        super().__init__('jit-stats', gdb.COMMAND_MAINTENANCE)
 
-            print("0x%016x  %-30s IL %s" %( pc, shorten(disassmInfo[0]['asm'], 30), gdb.default_visualizer(node).to_string()))
+    def invoke(self, args, from_tty):
+        argv = gdb.string_to_argv(args)
+        if len(argv) == 1 and argv[0] == 'reset':
+            for stats in all_stats():
+                stats.reset()
+        elif len(argv) != 0:
+            raise Exception("usage: jit-stats [reset]")
+        else:
+            self()
 
     def __call__(self):
-        comp = gdb.selected_frame().read_var('compiler')
-        insn = comp['_codeGenerator']['_firstInstruction']
-        while (int(insn) != 0): # while insn != nullptr
-            self._dump1(insn)
-            insn = insn['_next']
+        for stats in all_stats():
+            print("%s:" % stats.name)
+            counters = dict(stats.counters())
+            for counter, value in stats.counters():
+                print("  %-40s %10d" % (counter, value))
+                if counter.endswith(' hits'):
+                    misses = counters.get(counter[:-len('hits')] + 'misses', 0)
+                    if value + misses > 0:
+                        print("  %-40s %10.1f %%" % (counter[:-len('hits')] + 'hit rate', value * 100.0 / (value + misses)))
+            for timer, count, total in stats.timers():
+                print("  %-40s %10d x %10.3f s (avg %.3f ms)" % (timer, count, total, total * 1000 / count))
+
+jit_stats = __JITStats()
+
+class __ScanJIT(gdb.Command):
+    """
+    Scans JIT metadata and registers all compiled methods found.
+    Usage: jit-scan [JITCONFIG]
 
-di = __DumpInstructions()
+    JITCONFIG is an expression evaluating to J9JITConfig pointer.
+    If omitted, value of `jitConfig` is used.
 
+    Normally, methods are registered as they are compiled. Use this
+    command after attaching to a running JVM or with a core file.
+    """
+    def __init__(self):
+        super().__init__('jit-scan', gdb.COMMAND_DATA)
+
+    def invoke(self, args, from_tty):
+        argv = gdb.string_to_argv(args)
+        if len(argv) > 1:
+            raise Exception("jit-scan takes at most one argument (%d given)" % len(argv))
+        elif len(argv) == 0:
+            argv = ['jitConfig']
+        start = time.perf_counter()
+        methods = self(gdb.parse_and_eval(argv[0]))
+        print("Registered %d methods (%d known in total) in %.3f s" % (len(methods), len(method_index()), time.perf_counter() - start))
+
+    def __call__(self, jitConfig = None):
+        if jitConfig == None:
+            jitConfig = gdb.parse_and_eval('jitConfig')
+        ty_J9JITExceptionTable_ptr = pointer_type('J9JITExceptionTable')
+
+        known = set(method.metaData.address for method in method_index())
+        methods = []
+        for metaData in jit_artifacts(jitConfig['translationArtifacts']):
+            if metaData not in known:
+                # The PC-to-bytecode table is not available for methods
+                # compiled before GDB knew about them.
+                methods.append(MethodInfo(gdb.Value(metaData).cast(ty_J9JITExceptionTable_ptr), bytecodeTable=RangeMap()))
+        register_methods(methods)
+        return methods
+
+jit_scan = __ScanJIT()
+
+class __ExportPerf(gdb.Command):
+    """
+    Exports registered compiled methods for Linux perf.
+    Usage: jit-export-perf [-f] [map|jitdump|all]
+
+    `map` writes perf map /tmp/perf-<pid>.map, `jitdump` writes jitdump
+    /tmp/jit-<pid>.dump (with line number information), `all` (the default)
+    writes both. Methods already exported are not written again unless
+    -f is given, in which case the files are rewritten from scratch.
+
+    To export methods as they are compiled, see `set openj9 perf-export`.
+    """
+    def __init__(self):
+        super().__init__('jit-export-perf', gdb.COMMAND_DATA)
+
+    def invoke(self, args, from_tty):
+        argv = gdb.string_to_argv(args)
+        truncate = False
+        if len(argv) > 0 and argv[0] == '-f':
+            truncate = True
+            argv.pop(0)
+        if len(argv) > 1 or (len(argv) == 1 and not argv[0] in ('map', 'jitdump', 'all')):
+            raise Exception("usage: jit-export-perf [-f] [map|jitdump|all]")
+        format = argv[0] if len(argv) == 1 else 'all'
+        formats = ('map', 'jitdump') if format == 'all' else (format, )
+        start = time.perf_counter()
+        methods = list(method_index())
+        self(methods, formats, truncate)
+        print("Exported %d methods in %.3f s" % (len(methods), time.perf_counter() - start))
+
+    def __call__(self, methods = None, formats = ('map', 'jitdump'), truncate = False):
+        if methods == None:
+            methods = list(method_index())
+        perf.export(methods, formats, truncate)
+
+jit_export_perf = __ExportPerf()
+
+class __Profile(gdb.Command):
+    """
+    Profiles the inferior by periodically sampling stacks of all threads.
+    Usage: jprofile [-r RATE] [-t SECONDS] [-o FILE]
 
+    Lets the inferior run for SECONDS (10 by default), interrupting it
+    RATE times per second (100 by default). Stacks (with Java frames
+    mapped to methods and lines) are printed, or written to FILE,
+    in folded format suitable for flame graph tools.
+    """
+    def __init__(self):
+        super().__init__('jprofile', gdb.COMMAND_RUNNING)
+
+    def invoke(self, args, from_tty):
+        argv = gdb.string_to_argv(args)
+        rate = 100
+        duration = 10
+        output = None
+        while len(argv) > 0:
+            option = argv.pop(0)
+            if option == '-r' and len(argv) > 0:
+                rate = float(argv.pop(0))
+            elif option == '-t' and len(argv) > 0:
+                duration = float(argv.pop(0))
+            elif option == '-o' and len(argv) > 0:
+                output = argv.pop(0)
+            else:
+                raise Exception("usage: jprofile [-r RATE] [-t SECONDS] [-o FILE]")
+        if rate <= 0:
+            raise Exception("RATE must be positive")
+        profiler, elapsed = self(rate, duration)
+        if output != None:
+            with open(output, 'w') as f:
+                for line in profiler.folded():
+                    f.write(line + '\n')
+        else:
+            for line in profiler.folded():
+                print(line)
+        print("Collected %d samples in %.3f s (%.1f samples/s, %.1f requested)" % (profiler.samples, elapsed, profiler.samples / elapsed if elapsed > 0 else 0, rate))
+
+    def __call__(self, rate = 100, duration = 10):
+        profiler = Profiler()
+        elapsed = profiler.run(rate, duration)
+        return profiler, elapsed
+
+jprofile = __Profile()
+
+class __Record(gdb.Command):
+    """
+    Records state of the (stopped) inferior needed to replay unwinding
+    and method lookups offline.
+    Usage: jit-record [-a] FILE
+
+    Registers of Java frames of all threads, memory read when unwinding
+    them, metadata and names of all registered methods and code and line
+    number tables of methods on stacks (or of all methods if -a is given)
+    are written to (gzip-compressed) FILE. See benchmarks/replay.py.
+    """
+    def __init__(self):
+        super().__init__('jit-record', gdb.COMMAND_DATA, gdb.COMPLETE_FILENAME)
+
+    def invoke(self, args, from_tty):
+        argv = gdb.string_to_argv(args)
+        allMethods = False
+        if len(argv) > 0 and argv[0] == '-a':
+            allMethods = True
+            argv.pop(0)
+        if len(argv) != 1:
+            raise Exception("usage: jit-record [-a] FILE")
+        start = time.perf_counter()
+        snapshot, chunks = self(argv[0], allMethods)
+        print("Recorded %d frames, %d methods and %d bytes of memory in %.3f s" % (len(snapshot['frames']), len(snapshot['methods']), sum(len(data) for _, data in chunks), time.perf_counter() - start))
+
+    def __call__(self, filename, allMethods = False):
+        snapshot, chunks = record.record(allMethods)
+        record.write(filename, snapshot, chunks)
+        return snapshot, chunks
+
+jit_record = __Record()
@@ -0,0 +1,138 @@
+# Copyright (c) 2022 Jan Vrany
+#
+# This program and the accompanying materials are made available under
+# the terms of the MIT license, see LICENSE file.
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Minimal reader of ELF files, just enough to get section headers,
+symbols and (for core files) loadable segments and mapped files
+without going through GDB.
+"""
+import mmap
+import struct
+
+from collections import namedtuple
+
+SHT_SYMTAB = 2
+SHT_DYNSYM = 11
+
+STT_NOTYPE = 0
+STT_FUNC = 2
+
+PT_LOAD = 1
+PT_NOTE = 4
+
+NT_FILE = 0x46494c45
+
+Section = namedtuple('Section', ['name', 'type', 'addr', 'offset', 'size', 'link', 'entsize'])
+Symbol = namedtuple('Symbol', ['name', 'value', 'size', 'type', 'shndx'])
+Segment = namedtuple('Segment', ['type', 'flags', 'offset', 'vaddr', 'filesz', 'memsz'])
+Note = namedtuple('Note', ['name', 'type', 'desc'])
+MappedFile = namedtuple('MappedFile', ['start', 'end', 'offset', 'filename'])
+
+class ElfFile(object):
+    """
+    An ELF (64-bit) file. The file is mmap'ed, call close()
+    when no longer needed.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, 'rb') as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._data[0:4] != b'\x7fELF':
+            raise ValueError("not an ELF file: %s" % filename)
+        if self._data[4] != 2:
+            raise ValueError("not a 64-bit ELF file: %s" % filename)
+        self._endian = '<' if self._data[5] == 1 else '>'
+
+        (self.type, self.machine, _, _, self.phoff, self.shoff, _, _,
+         self.phentsize, self.phnum, self.shentsize, self.shnum, self.shstrndx) = \
+            struct.unpack_from(self._endian + 'HHIQQQIHHHHHH', self._data, 16)
+
+        self.sections = []
+        for i in range(0, self.shnum):
+            name, type, _, addr, offset, size, link, _, _, entsize = \
+                struct.unpack_from(self._endian + 'IIQQQQIIQQ', self._data, self.shoff + i * self.shentsize)
+            self.sections.append(Section(name, type, addr, offset, size, link, entsize))
+        if self.shstrndx < len(self.sections):
+            shstrtab = self.sections[self.shstrndx]
+            self.sections = [section._replace(name=self._string(shstrtab, section.name)) for section in self.sections]
+
+        self.segments = []
+        for i in range(0, self.phnum):
+            type, flags, offset, vaddr, _, filesz, memsz, _ = \
+                struct.unpack_from(self._endian + 'IIQQQQQQ', self._data, self.phoff + i * self.phentsize)
+            self.segments.append(Segment(type, flags, offset, vaddr, filesz, memsz))
+
+    def close(self):
+        self._data.close()
+
+    def _string(self, strtab, index):
+        start = strtab.offset + index
+        end = self._data.find(b'\0', start, strtab.offset + strtab.size)
+        return self._data[start:end].decode(errors='replace')
+
+    def view(self, offset, size):
+        """
+        Return a memoryview of `size` bytes of file at given offset
+        (without copying).
+        """
+        return memoryview(self._data)[offset:offset + size]
+
+    def section(self, name):
+        """
+        Return section with given name or None
+        """
+        for section in self.sections:
+            if section.name == name:
+                return section
+        return None
+
+    def symbols(self):
+        """
+        Return a list of all symbols in .symtab and .dynsym.
+        """
+        symbols = []
+        for section in self.sections:
+            if section.type in (SHT_SYMTAB, SHT_DYNSYM):
+                strtab = self.sections[section.link]
+                for offset in range(section.offset, section.offset + section.size, section.entsize):
+                    name, info, _, shndx, value, size = struct.unpack_from(self._endian + 'IBBHQQ', self._data, offset)
+                    if name != 0:
+                        symbols.append(Symbol(self._string(strtab, name), value, size, info & 0xF, shndx))
+        return symbols
+
+    def notes(self):
+        """
+        Return a list of all notes in PT_NOTE segments.
+        """
+        notes = []
+        for segment in self.segments:
+            if segment.type == PT_NOTE:
+                offset = segment.offset
+                end = segment.offset + segment.filesz
+                while offset + 12 <= end:
+                    namesz, descsz, type = struct.unpack_from(self._endian + 'III', self._data, offset)
+                    offset = offset + 12
+                    name = self._data[offset:offset + namesz].rstrip(b'\0').decode(errors='replace')
+                    offset = offset + ((namesz + 3) & ~3)
+                    notes.append(Note(name, type, self.view(offset, descsz)))
+                    offset = offset + ((descsz + 3) & ~3)
+        return notes
+
+    def mapped_files(self):
+        """
+        Return a list of files mapped into process' memory as recorded
+        in core file's NT_FILE note.
+        """
+        files = []
+        for note in self.notes():
+            if note.name == 'CORE' and note.type == NT_FILE:
+                count, pageSize = struct.unpack_from(self._endian + 'QQ', note.desc, 0)
+                names = bytes(note.desc[16 + count * 24:]).split(b'\0')
+                for i in range(0, count):
+                    start, end, pageOffset = struct.unpack_from(self._endian + 'QQQ', note.desc, 16 + i * 24)
+                    files.append(MappedFile(start, end, pageOffset * pageSize, names[i].decode(errors='replace')))
+        return files
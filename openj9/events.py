@@ -0,0 +1,43 @@
+# Copyright (c) 2022 Jan Vrany
+#
+# This program and the accompanying materials are made available under
+# the terms of the MIT license, see LICENSE file.
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Helpers to connect handlers to GDB events in a way that survives
+reloading of modules.
+"""
+import gdb
+
+# Handlers connected so far, keyed by event name and handler's
+# (qualified) name. Retained across reloads so that handlers
+# installed by previous version of a module can be disconnected.
+_connected = globals().get('_connected', {})
+
+def connect(event, handler):
+    """
+    Connect `handler` to GDB event registry named `event` (such as 'cont'
+    or 'new_objfile'), replacing previously connected handler of the same
+    name. Events not supported by running GDB are ignored.
+    """
+    registry = getattr(gdb.events, event, None)
+    if registry == None:
+        return
+    key = (event, handler.__module__, handler.__qualname__)
+    if key in _connected:
+        try:
+            registry.disconnect(_connected[key])
+        except:
+            pass
+    registry.connect(handler)
+    _connected[key] = handler
+
+def is_file_objfile(objfile):
+    """
+    Return True if `objfile` has been loaded from a file as opposed to
+    objfiles created by OpenJ9 support for compiled methods. GDB keeps
+    absolute paths of the former.
+    """
+    return objfile.filename != None and objfile.filename.startswith('/')
@@ -0,0 +1,331 @@
+# Copyright (c) 2022 Jan Vrany
+#
+# This program and the accompanying materials are made available under
+# the terms of the MIT license, see LICENSE file.
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Read-through cache of inferior's memory. Decoders read small pieces
+of memory (one struct or string at a time), each being a separate
+round trip to the target. Instead, memory is read in whole pages which
+are kept until the inferior is resumed or its memory changes. They
+are also discarded whenever internal breakpoints are hit, see
+openj9._clear_caches().
+
+When debugging a core file, memory is read directly from the (mmap'ed)
+core file and files mapped into the process, see CoreFileMemory.
+"""
+import re
+import os.path
+import mmap
+import gdb
+
+from bisect import bisect_right
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from openj9 import events
+from openj9 import settings
+from openj9.elf import ElfFile, PT_LOAD
+from openj9.stats import Stats
+
+PAGE_SIZE = 4096
+
+_stats = Stats('memory')
+
+class PageCache(object):
+    """
+    A bounded LRU cache of inferior's memory pages.
+    """
+    def __init__(self):
+        self._pages = OrderedDict()
+
+    def clear(self):
+        self._pages.clear()
+
+    def _page(self, page):
+        """
+        Return (cached) contents of page at given (page-aligned) address
+        or None if it cannot be read as a whole.
+        """
+        data = self._pages.get(page)
+        if data != None:
+            _stats.increment('page hits')
+            self._pages.move_to_end(page)
+            return data
+        _stats.increment('page misses')
+        try:
+            data = bytes(gdb.selected_inferior().read_memory(page, PAGE_SIZE))
+        except gdb.MemoryError:
+            # Page is only partially accessible (or not at all),
+            # let the caller read what it needs directly.
+            return None
+        _stats.increment('bytes read', PAGE_SIZE)
+        self._pages[page] = data
+        capacity = settings.memory_cache_pages.value
+        while len(self._pages) > capacity:
+            self._pages.popitem(last=False)
+        return data
+
+    def read(self, addr, size):
+        """
+        Read `size` bytes at `addr` and return them as bytes.
+        Raise gdb.MemoryError if memory cannot be read.
+        """
+        addr = int(addr)
+        if size <= 0:
+            return b''
+        if settings.memory_cache_pages.value == 0:
+            _stats.increment('bytes read', size)
+            return bytes(gdb.selected_inferior().read_memory(addr, size))
+
+        chunks = []
+        end = addr + size
+        while addr < end:
+            page = addr & ~(PAGE_SIZE - 1)
+            chunkEnd = min(end, page + PAGE_SIZE)
+            data = self._page(page)
+            if data != None:
+                chunks.append(data[addr - page:chunkEnd - page])
+            else:
+                _stats.increment('bytes read', chunkEnd - addr)
+                chunks.append(bytes(gdb.selected_inferior().read_memory(addr, chunkEnd - addr)))
+            addr = chunkEnd
+        if len(chunks) == 1:
+            return chunks[0]
+        return b''.join(chunks)
+
+class CoreFileMemory(object):
+    """
+    Memory of a process as recorded in a core file. Contents of PT_LOAD
+    segments are served from the core file itself, contents of memory not
+    dumped into the core (typically text of the executable and shared
+    libraries) from files recorded in NT_FILE note if they can be found.
+    Both are mmap'ed so reads do not copy.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self._core = ElfFile(filename)
+        self._starts = []
+        self._regions = []
+        for segment in sorted(self._core.segments, key=lambda segment: segment.vaddr):
+            if segment.type == PT_LOAD and segment.filesz > 0:
+                self._starts.append(segment.vaddr)
+                self._regions.append((segment.vaddr, segment.vaddr + segment.filesz, self._core.view(segment.offset, segment.filesz)))
+
+        self._fileStarts = []
+        self._files = []
+        for mapping in sorted(self._core.mapped_files(), key=lambda mapping: mapping.start):
+            self._fileStarts.append(mapping.start)
+            self._files.append(mapping)
+        # Mmap'ed files mapped into the process keyed by filename,
+        # None if the file cannot be read.
+        self._mmaps = {}
+
+    def _mmap(self, filename):
+        if not filename in self._mmaps:
+            data = None
+            if os.path.isfile(filename):
+                try:
+                    with open(filename, 'rb') as f:
+                        data = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+                except (OSError, ValueError):
+                    pass
+            self._mmaps[filename] = data
+        return self._mmaps[filename]
+
+    def close(self):
+        """
+        Unmap the core file and mapped files. Views returned by view()
+        still referenced keep their file mapped until released.
+        """
+        views = [data for _, _, data in self._regions]
+        mmaps = [data for data in self._mmaps.values() if data != None]
+        self._starts = []
+        self._regions = []
+        self._fileStarts = []
+        self._files = []
+        self._mmaps = {}
+        for data in views:
+            data.release()
+        for data in mmaps:
+            mapped = data.obj
+            data.release()
+            try:
+                mapped.close()
+            except BufferError:
+                pass
+        try:
+            self._core.close()
+        except BufferError:
+            pass
+
+    def view(self, addr, size):
+        """
+        Return a memoryview of `size` bytes at `addr` or None if the
+        range is not (wholly) available in the core file nor in any of
+        mapped files.
+        """
+        i = bisect_right(self._starts, addr) - 1
+        if i >= 0:
+            start, end, data = self._regions[i]
+            if addr + size <= end:
+                return data[addr - start:addr - start + size]
+            if addr < end:
+                # Range spans more segments, join them if adjacent
+                chunks = [data[addr - start:]]
+                covered = end
+                j = i + 1
+                while covered < addr + size and j < len(self._regions) and self._regions[j][0] == covered:
+                    _, nextEnd, nextData = self._regions[j]
+                    chunks.append(nextData[:min(nextEnd, addr + size) - covered])
+                    covered = nextEnd
+                    j = j + 1
+                if covered >= addr + size:
+                    return memoryview(b''.join(chunks))
+                # Contents of mapped files may differ from what is
+                # in memory (private writable mappings), let the
+                # caller read memory through GDB.
+                return None
+        if i + 1 < len(self._starts) and self._starts[i + 1] < addr + size:
+            # Range overlaps a segment dumped into the core file, see above
+            return None
+        i = bisect_right(self._fileStarts, addr) - 1
+        if i >= 0:
+            mapping = self._files[i]
+            if addr + size <= mapping.end:
+                data = self._mmap(mapping.filename)
+                if data != None:
+                    offset = mapping.offset + addr - mapping.start
+                    if offset + size <= len(data):
+                        return data[offset:offset + size]
+        return None
+
+_cache = PageCache()
+
+# CoreFileMemory of the core file being debugged (or None) and
+# (inferior, pid) it has been determined for.
+_core = None
+_coreKey = None
+
+def _core_filename():
+    """
+    Return the filename of the core file being debugged or None.
+    """
+    try:
+        files = gdb.execute('info files', to_string=True)
+    except gdb.error:
+        return None
+    match = re.search(r"Local core dump file:\s*`(.*)', file type", files)
+    if match == None:
+        return None
+    return match.group(1)
+
+def _core_memory():
+    """
+    Return CoreFileMemory of the core file being debugged or None,
+    if not debugging a core file or reading from it is disabled.
+    """
+    global _core, _coreKey
+    if not settings.core_file_memory.value:
+        return None
+    inferior = gdb.selected_inferior()
+    key = (inferior.num, inferior.pid)
+    if key != _coreKey:
+        _coreKey = key
+        if _core != None:
+            _core.close()
+        _core = None
+        filename = _core_filename()
+        if filename != None:
+            try:
+                _core = CoreFileMemory(filename)
+            except (OSError, ValueError):
+                pass
+    return _core
+
+def _clear(event = None):
+    _cache.clear()
+
+def _reset(event = None):
+    global _core, _coreKey
+    if event != None and hasattr(event, 'new_objfile') and not events.is_file_objfile(event.new_objfile):
+        return
+    if _core != None:
+        _core.close()
+    _core = None
+    _coreKey = None
+
+events.connect('cont', _clear)
+events.connect('memory_changed', _clear)
+events.connect('inferior_call', _clear)
+events.connect('exited', _clear)
+events.connect('exited', _reset)
+events.connect('new_objfile', _reset)
+events.connect('clear_objfiles', _reset)
+
+# Ranges of memory read while recording keyed by page address,
+# see recording(). None unless recording.
+_touched = None
+
+def _touch(addr, size):
+    page = addr & ~(PAGE_SIZE - 1)
+    end = addr + size
+    while page < end:
+        start = max(addr, page) - page
+        stop = min(end, page + PAGE_SIZE) - page
+        touched = _touched.get(page)
+        if touched != None:
+            start = min(start, touched[0])
+            stop = max(stop, touched[1])
+        _touched[page] = (start, stop)
+        page = page + PAGE_SIZE
+
+@contextmanager
+def recording():
+    """
+    Record memory read (by view() and read()) in the body of `with`
+    statement. Yields a dictionary mapping addresses of pages read to
+    (start, end) offsets of the part of the page read.
+    """
+    global _touched
+    previous = _touched
+    _touched = {}
+    try:
+        yield _touched
+    finally:
+        _touched = previous
+
+def view(addr, size):
+    """
+    Return `size` bytes of inferior's memory at `addr` as a memoryview.
+    With a core file, no copy is made. Otherwise, memory is read through
+    the cache. Raise gdb.MemoryError if memory cannot be read.
+    """
+    addr = int(addr)
+    if _touched != None:
+        _touch(addr, size)
+    core = _core_memory()
+    if core != None:
+        data = core.view(addr, size)
+        if data != None:
+            _stats.increment('core file reads')
+            return data
+    return memoryview(_cache.read(addr, size))
+
+def read(addr, size):
+    """
+    Read `size` bytes of inferior's memory at `addr` and return them
+    as bytes. See view().
+    """
+    addr = int(addr)
+    if _touched != None:
+        _touch(addr, size)
+    core = _core_memory()
+    if core != None:
+        data = core.view(addr, size)
+        if data != None:
+            _stats.increment('core file reads')
+            return bytes(data)
+    return _cache.read(addr, size)
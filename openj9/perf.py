@@ -0,0 +1,180 @@
+# Copyright (c) 2022 Jan Vrany
+#
+# This program and the accompanying materials are made available under
+# the terms of the MIT license, see LICENSE file.
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Export of registered compiled methods for Linux perf, both as perf
+map (/tmp/perf-<pid>.map) and as jitdump (/tmp/jit-<pid>.dump).
+
+References:
+
+ [1]: https://github.com/torvalds/linux/blob/master/tools/perf/Documentation/jit-interface.txt
+ [2]: https://github.com/torvalds/linux/blob/master/tools/perf/Documentation/jitdump-specification.txt
+"""
+import os
+import struct
+import time
+import gdb
+
+from openj9 import settings
+from openj9.stats import Stats
+
+_stats = Stats('perf')
+
+JITHEADER_MAGIC = 0x4A695444
+JITHEADER_VERSION = 1
+
+JIT_CODE_LOAD = 0
+JIT_CODE_DEBUG_INFO = 2
+
+# FIXME: RISC-V specific
+EM_RISCV = 243
+
+def timestamp():
+    """
+    Return current time as expected in jitdump records
+    """
+    # perf expects CLOCK_MONOTONIC unless JITDUMP_FLAGS_ARCH_TIMESTAMP
+    # is set in the header.
+    return time.clock_gettime_ns(time.CLOCK_MONOTONIC)
+
+class PerfMapWriter(object):
+    """
+    Appends entries for compiled methods to perf map file [1].
+    """
+    def __init__(self, path):
+        self.path = path
+
+    def write(self, methods, exported, truncate = False):
+        """
+        Write entries for given methods and add address of metadata of
+        each method written to `exported`. Methods that cannot be read
+        are skipped.
+        """
+        with open(self.path, 'w' if truncate else 'a') as f:
+            for method in methods:
+                try:
+                    entry = "%x %x %s\n" % (method.startPC, method.endPC - method.startPC, method.name)
+                except gdb.error:
+                    _stats.increment('perf map methods skipped')
+                    continue
+                f.write(entry)
+                exported.add(method.metaData.address)
+                _stats.increment('perf map entries')
+
+class JitDumpWriter(object):
+    """
+    Appends code load and debug info records for compiled methods to
+    jitdump file [2]. The header is written when the file is created
+    (or truncated).
+    """
+    def __init__(self, path, pid):
+        self.path = path
+        self.pid = pid
+
+    def _header(self):
+        return struct.pack('<IIIIIIQQ', JITHEADER_MAGIC, JITHEADER_VERSION, 40,
+                           EM_RISCV, 0, self.pid, timestamp(), 0)
+
+    def _debug_info(self, method, loaded):
+        try:
+            filename = (method.className + '.java').encode() + b'\0'
+            linetable = method.linetable()
+        except Exception:
+            # Line number table cannot be read or decoded (gdb.error,
+            # KeyError or invalid encoding), export code only.
+            _stats.increment('jitdump debug info skipped')
+            return None
+        entries = []
+        for entry in linetable:
+            if len(entries) == 0 or entries[-1][1] != entry.line:
+                entries.append((entry.pc, entry.line))
+        if len(entries) == 0:
+            return None
+        record = b''.join(struct.pack('<QII', pc, line, 0) + filename for pc, line in entries)
+        return struct.pack('<IIQQQ', JIT_CODE_DEBUG_INFO, 32 + len(record), loaded,
+                           method.startPC, len(entries)) + record
+
+    def _code_load(self, method, code, loaded):
+        name = method.name.encode() + b'\0'
+        return struct.pack('<IIQIIQQQQ', JIT_CODE_LOAD, 56 + len(name) + len(code), loaded,
+                           self.pid, self.pid, method.startPC, method.startPC, len(code),
+                           method.metaData.address) + name + code
+
+    def write(self, methods, exported, truncate = False):
+        """
+        Write records for given methods and add address of metadata of
+        each method written to `exported`. Methods that cannot be read
+        are skipped.
+        """
+        if truncate or not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            mode = 'wb'
+        else:
+            mode = 'ab'
+        with open(self.path, mode) as f:
+            if mode == 'wb':
+                f.write(self._header())
+            for method in methods:
+                code = method.code
+                if code == None:
+                    _stats.increment('jitdump methods skipped')
+                    continue
+                # Records are stamped with the time the code has been
+                # loaded, if known (see MethodInfoRegistrar).
+                loaded = method.loadTimestamp
+                if loaded == None:
+                    loaded = timestamp()
+                # Build both records first so a failure does not leave
+                # partial records in the file.
+                try:
+                    debugInfo = self._debug_info(method, loaded)
+                    codeLoad = self._code_load(method, code, loaded)
+                except gdb.error:
+                    _stats.increment('jitdump methods skipped')
+                    continue
+                # Debug info must precede code load record it belongs to
+                if debugInfo != None:
+                    f.write(debugInfo)
+                f.write(codeLoad)
+                exported.add(method.metaData.address)
+                _stats.increment('jitdump entries')
+
+# Addresses of metadata of methods already exported keyed by
+# (format, pid). Retained across reloads.
+_exported = globals().get('_exported', {})
+
+def export(methods, formats = ('map', 'jitdump'), truncate = False):
+    """
+    Export given methods (except those already exported) in given
+    formats, 'map' and/or 'jitdump'. If `truncate` is True, existing
+    files are rewritten from scratch.
+    """
+    pid = gdb.selected_inferior().pid
+    with _stats.timed('export'):
+        for format in formats:
+            exported = _exported.setdefault((format, pid), set())
+            if truncate:
+                exported.clear()
+            todo = [method for method in methods if not method.isStale and not method.metaData.address in exported]
+            if format == 'map':
+                writer = PerfMapWriter('/tmp/perf-%d.map' % pid)
+            elif format == 'jitdump':
+                writer = JitDumpWriter('/tmp/jit-%d.dump' % pid, pid)
+            else:
+                raise ValueError("invalid format: %s" % format)
+            writer.write(todo, exported, truncate)
+
+def export_registered(methods):
+    """
+    Export newly registered methods as set by `set openj9 perf-export`
+    """
+    mode = settings.perf_export.value
+    if mode == 'map':
+        export(methods, ('map',))
+    elif mode == 'jitdump':
+        export(methods, ('jitdump',))
+    elif mode == 'all':
+        export(methods)
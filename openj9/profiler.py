@@ -0,0 +1,150 @@
+# Copyright (c) 2022 Jan Vrany
+#
+# This program and the accompanying materials are made available under
+# the terms of the MIT license, see LICENSE file.
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Simple sampling profiler. The inferior is periodically interrupted
+(by sending it SIGINT) and stacks of all its threads are unwound, mapped
+to Java methods (and lines) or native functions and aggregated into
+folded stacks as consumed by flame graph tools, see `jprofile` command.
+
+References:
+
+ [1]: https://github.com/brendangregg/FlameGraph#2-fold-stacks
+"""
+import os
+import signal
+import threading
+import time
+import gdb
+
+from openj9 import events
+from openj9.utils import method_index
+from openj9.stats import Stats
+
+_stats = Stats('jprofile')
+
+# Most recent stop event, used to tell samples (stops caused by
+# SIGINT sent by profiler) from other stops (breakpoints, ...)
+_last_stop = None
+
+def _on_stop(event):
+    global _last_stop
+    _last_stop = event
+
+events.connect('stop', _on_stop)
+
+class Profiler(object):
+    """
+    Collects and aggregates stacks of all threads of the inferior.
+    Labels of frames are cached for the lifetime of the profiler so
+    names are decoded once.
+    """
+
+    # Frames deeper than this are not sampled
+    _MAX_DEPTH = 512
+
+    def __init__(self):
+        self.stacks = {}
+        self.samples = 0
+        self._java_labels = {}
+        self._native_labels = {}
+
+    def _label(self, frame, innermost):
+        pc = frame.pc()
+        # For caller frames, PC is the return address which may
+        # already belong to the next line (or method).
+        lookupPC = pc if innermost else pc - 1
+        method = method_index().lookup(lookupPC)
+        if method != None:
+            try:
+                line = method.lineNumberTable[method.bytecodeTable[lookupPC]]
+            except (KeyError, TypeError, gdb.error):
+                # Line is not known or line number table cannot
+                # be read, label the frame with method only.
+                line = None
+            key = (method, line)
+            label = self._java_labels.get(key)
+            if label == None:
+                if line != None:
+                    label = "%s:%d" % (method.name, line)
+                else:
+                    label = method.name
+                self._java_labels[key] = label
+            return label
+        label = self._native_labels.get(pc)
+        if label == None:
+            label = frame.name()
+            if label == None:
+                label = "0x%x" % pc
+            self._native_labels[pc] = label
+        return label
+
+    def _stack(self):
+        stack = []
+        frame = gdb.newest_frame()
+        while frame != None and len(stack) < self._MAX_DEPTH:
+            stack.append(self._label(frame, len(stack) == 0))
+            try:
+                frame = frame.older()
+            except gdb.error:
+                break
+        stack.reverse()
+        return tuple(stack)
+
+    def sample(self):
+        """
+        Record stacks of all threads of (stopped) inferior.
+        """
+        with _stats.timed('sample'):
+            for thread in gdb.selected_inferior().threads():
+                if not thread.is_valid():
+                    continue
+                thread.switch()
+                try:
+                    stack = self._stack()
+                except gdb.error:
+                    _stats.increment('stacks not unwound')
+                    continue
+                self.stacks[stack] = self.stacks.get(stack, 0) + 1
+            self.samples = self.samples + 1
+
+    def run(self, rate, duration):
+        """
+        Let the inferior run for `duration` seconds, interrupting it
+        `rate` times per second and recording stacks. Return time
+        (in seconds) actually spent.
+        """
+        inferior = gdb.selected_inferior()
+        pid = inferior.pid
+        if pid == 0:
+            raise Exception("The program is not being run.")
+        interval = 1.0 / rate
+        selected = gdb.selected_thread()
+        start = time.perf_counter()
+        try:
+            while time.perf_counter() - start < duration:
+                timer = threading.Timer(interval, os.kill, (pid, signal.SIGINT))
+                timer.start()
+                try:
+                    gdb.execute('continue', to_string=True)
+                finally:
+                    timer.cancel()
+                if inferior.pid == 0:
+                    # Inferior has exited
+                    break
+                if isinstance(_last_stop, gdb.SignalEvent) and _last_stop.stop_signal == 'SIGINT':
+                    self.sample()
+        finally:
+            if selected != None and selected.is_valid():
+                selected.switch()
+        return time.perf_counter() - start
+
+    def folded(self):
+        """
+        Return aggregated stacks in folded format [1], one stack per line.
+        """
+        return ["%s %d" % (';'.join(stack), count) for stack, count in sorted(self.stacks.items())]
@@ -0,0 +1,235 @@
+# Copyright (c) 2022 Jan Vrany
+#
+# This program and the accompanying materials are made available under
+# the terms of the MIT license, see LICENSE file.
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Recording of the state of (stopped) inferior needed to replay unwinding
+of Java frames and method lookups offline, without the inferior, see
+`jit-record` command and benchmarks/replay.py.
+
+A record is a gzip-compressed file consisting of a header (magic, version
+and size of the snapshot), the snapshot itself as JSON and chunks of
+inferior's memory, each prefixed by its address and size (all
+little-endian).
+"""
+import gzip
+import json
+import struct
+import gdb
+
+from openj9 import memory
+from openj9.memory import PAGE_SIZE
+from openj9.stats import Stats
+from openj9.utils import method_index
+from openj9.unwinder import jit_helper_table, _cInterpreter_address, _unwind_cache_clear
+from openj9.runtime.types import lookup_type, field, sizeof, offsetof, is_signed
+from openj9.runtime.util.mthutil_c import decodeROMMethod
+
+_stats = Stats('jit-record')
+
+MAGIC = b'J9REC'
+VERSION = 1
+
+_HEADER = struct.Struct('<5sBI')
+_CHUNK = struct.Struct('<QI')
+
+# Types whose layout OpenJ9 support relies on when unwinding
+# and decoding methods
+TYPES = ('J9JITExceptionTable', 'J9UTF8', 'J9Method', 'J9ROMMethod',
+         'J9MethodDebugInfo', 'J9ExceptionInfo', 'J9ExceptionHandler')
+
+# Registers read by JITUnwinder
+REGISTERS = ('pc', 's11', 'ra', 'sp')
+
+# Frames deeper than this are not recorded
+_MAX_DEPTH = 4096
+
+def _type_layout(name):
+    """
+    Return size and fields of type of given name as recorded in
+    snapshot.
+    """
+    ty = lookup_type(name).strip_typedefs()
+    fields = []
+    for f in ty.fields():
+        if f.name == None:
+            continue
+        fty = f.type.strip_typedefs()
+        entry = { 'name' : f.name, 'bitpos' : f.bitpos, 'bitsize' : f.bitsize, 'size' : fty.sizeof }
+        if fty.code == gdb.TYPE_CODE_INT:
+            entry['code'] = 'int'
+            entry['signed'] = is_signed(fty)
+        elif fty.code == gdb.TYPE_CODE_PTR:
+            entry['code'] = 'ptr'
+            entry['target'] = fty.target().strip_typedefs().name
+        else:
+            entry['code'] = 'other'
+        fields.append(entry)
+    return { 'size' : ty.sizeof, 'fields' : fields }
+
+def _frames(index):
+    """
+    Walk stacks of all threads and return (recorded) Java frames and
+    a set of their methods.
+    """
+    frames = []
+    methods = set()
+    selected = gdb.selected_thread()
+    try:
+        for thread in gdb.selected_inferior().threads():
+            if not thread.is_valid():
+                continue
+            thread.switch()
+            try:
+                frame = gdb.newest_frame()
+            except gdb.error:
+                continue
+            level = 0
+            while frame != None and level < _MAX_DEPTH:
+                # Unwinding this frame (in older()) reads memory
+                # to be recorded.
+                try:
+                    older = frame.older()
+                except gdb.error:
+                    older = None
+                method = index.lookup(frame.pc())
+                if method != None:
+                    caller = None
+                    if older != None:
+                        caller = { 'pc' : int(older.read_register('pc')), 's11' : int(older.read_register('s11')) }
+                    frames.append({
+                        'thread' : thread.num,
+                        'level' : level,
+                        'registers' : dict((reg, int(frame.read_register(reg))) for reg in REGISTERS),
+                        'caller' : caller
+                    })
+                    methods.add(method)
+                frame = older
+                level = level + 1
+    finally:
+        if selected != None and selected.is_valid():
+            selected.switch()
+    return frames, methods
+
+def _touch_method(method, full):
+    """
+    Read method's metadata and names and, if `full` is True, its code
+    and ROM method (with line number table) so they are recorded.
+    """
+    try:
+        address = method.metaData.address
+        memory.view(address, sizeof('J9JITExceptionTable'))
+        for name in ('className', 'methodName', 'methodSignature'):
+            utf8 = field('J9JITExceptionTable', name).read(address)
+            if utf8 != 0:
+                memory.view(utf8, offsetof('J9UTF8', 'data') + field('J9UTF8', 'length').read(utf8))
+        if full:
+            memory.view(method.startPC, method.endPC - method.startPC)
+            bytecodes = field('J9Method', 'bytecodes').read(method.metaData.ramMethod)
+            decodeROMMethod(bytecodes - sizeof('J9ROMMethod'))
+    except gdb.MemoryError:
+        _stats.increment('methods not recorded completely')
+
+def _chunks(touched):
+    """
+    Return a list of (address, bytes) of memory read as recorded by
+    memory.recording(). Whole pages are saved where possible, adjacent
+    ones are merged.
+    """
+    chunks = []
+    for page in sorted(touched):
+        try:
+            addr = page
+            data = memory.read(page, PAGE_SIZE)
+        except gdb.MemoryError:
+            start, end = touched[page]
+            try:
+                addr = page + start
+                data = memory.read(addr, end - start)
+            except gdb.MemoryError:
+                _stats.increment('pages not recorded')
+                continue
+        if len(chunks) > 0 and chunks[-1][0] + len(chunks[-1][1]) == addr:
+            chunks[-1][1].extend(data)
+        else:
+            chunks.append((addr, bytearray(data)))
+    return chunks
+
+def record(allMethods = False):
+    """
+    Snapshot the state of the inferior needed to replay unwinding of
+    Java frames of all threads and lookups of registered methods.
+    Code and line number tables are recorded only for methods on stacks
+    unless `allMethods` is True. Return a tuple (snapshot, chunks of memory).
+    """
+    index = method_index()
+    with _stats.timed('record'):
+        # Make sure frames are unwound again (and memory read)
+        gdb.invalidate_cached_frames()
+        _unwind_cache_clear()
+        with memory.recording() as touched:
+            frames, onStack = _frames(index)
+            methods = []
+            for method in index:
+                _touch_method(method, allMethods or method in onStack)
+                methods.append({ 'metaData' : method.metaData.address, 'bytecodeTable' : list(method.bytecodeTable) })
+        chunks = _chunks(touched)
+
+        helpers = jit_helper_table()
+        if helpers != None:
+            # Only returnFromJIT* helpers affect unwinding
+            helpers = [list(helper) for helper in helpers if helper.isReturnFromJIT]
+        try:
+            cInterpreter = _cInterpreter_address()
+        except (gdb.error, AttributeError):
+            # No symbol cInterpreter
+            cInterpreter = None
+
+        inferior = gdb.selected_inferior()
+        snapshot = {
+            'architecture' : inferior.architecture().name(),
+            'pid' : inferior.pid,
+            'types' : dict((name, _type_layout(name)) for name in TYPES),
+            'helpers' : helpers,
+            'cInterpreter' : cInterpreter,
+            'methods' : methods,
+            'frames' : frames,
+        }
+    _stats.increment('frames recorded', len(frames))
+    _stats.increment('bytes recorded', sum(len(data) for _, data in chunks))
+    return snapshot, chunks
+
+def write(filename, snapshot, chunks):
+    """
+    Write snapshot and chunks of memory (see record()) to file
+    """
+    header = json.dumps(snapshot, separators = (',', ':')).encode()
+    with gzip.open(filename, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(header)))
+        f.write(header)
+        for addr, data in chunks:
+            f.write(_CHUNK.pack(addr, len(data)))
+            f.write(data)
+
+def read(filename):
+    """
+    Read record from file. Return a tuple (snapshot, chunks of memory),
+    see record().
+    """
+    with gzip.open(filename, 'rb') as f:
+        magic, version, size = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != MAGIC:
+            raise ValueError("not a jit-record file: %s" % filename)
+        if version != VERSION:
+            raise ValueError("unsupported jit-record version: %d" % version)
+        snapshot = json.loads(f.read(size))
+        chunks = []
+        header = f.read(_CHUNK.size)
+        while len(header) == _CHUNK.size:
+            addr, size = _CHUNK.unpack(header)
+            chunks.append((addr, f.read(size)))
+            header = f.read(_CHUNK.size)
+    return snapshot, chunks
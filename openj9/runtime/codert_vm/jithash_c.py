@@ -0,0 +1,78 @@
+import gdb
+import struct
+
+from openj9 import memory
+from openj9.runtime.types import field, sizeof
+
+#define JIT_HASH_IN_METHOD_STORE 1
+JIT_HASH_IN_METHOD_STORE = 1
+
+#define DETERMINE_BUCKET_SHIFT 9
+DETERMINE_BUCKET_SHIFT = 9
+
+#define AVL_BALANCEMASK 0x3
+AVL_BALANCEMASK = 0x3
+
+def _read(addr, size):
+    return memory.view(addr, size)
+
+#define AVL_SRP_GETNODE(node) ((J9AVLTreeNode *)(AVL_GETNODE(node) ? AVL_NNSRP_GETNODE(node) : NULL))
+def _AVL_SRP_GETNODE(nodeAddr, field, nodeBuf):
+    srp = field.extract(nodeBuf)
+    if (srp & ~AVL_BALANCEMASK) == 0:
+        return 0
+    return (nodeAddr + field.offset + srp) & ~AVL_BALANCEMASK
+
+def _hash_jit_bucket_entries(bucket):
+    """
+    Return a list of J9JITExceptionTable addresses stored in a bucket
+    """
+    if bucket & JIT_HASH_IN_METHOD_STORE:
+        # Bucket points to an array in method store, the last
+        # entry in the array is tagged.
+        entries = []
+        entryAddr = bucket & ~JIT_HASH_IN_METHOD_STORE
+        while True:
+            entry = struct.unpack('<Q', _read(entryAddr, 8))[0]
+            entries.append(entry & ~JIT_HASH_IN_METHOD_STORE)
+            if entry & JIT_HASH_IN_METHOD_STORE:
+                return entries
+            entryAddr = entryAddr + 8
+    else:
+        return [bucket]
+
+def jit_artifacts(translationArtifacts):
+    """
+    Return a list of addresses of all J9JITExceptionTables (method metadata)
+    stored in JIT artifacts tree `translationArtifacts` (a J9AVLTree of
+    J9JITHashTables, one per code cache segment).
+    """
+    rootNode = field('J9AVLTree', 'rootNode')
+    leftChild = field('J9AVLTreeNode', 'leftChild')
+    rightChild = field('J9AVLTreeNode', 'rightChild')
+    buckets = field('J9JITHashTable', 'buckets')
+    start = field('J9JITHashTable', 'start')
+    end = field('J9JITHashTable', 'end')
+
+    artifacts = []
+    seen = set()
+    nodes = [ rootNode.read(int(translationArtifacts)) ]
+    while len(nodes) > 0:
+        node = nodes.pop()
+        if node == 0:
+            continue
+        # J9AVLTreeNode is the first member of J9JITHashTable
+        table = _read(node, sizeof('J9JITHashTable'))
+        nodes.append(_AVL_SRP_GETNODE(node, leftChild, table))
+        nodes.append(_AVL_SRP_GETNODE(node, rightChild, table))
+
+        numBuckets = ((end.extract(table) - start.extract(table)) >> DETERMINE_BUCKET_SHIFT) + 1
+        bucketsBuf = _read(buckets.extract(table), numBuckets * 8)
+        for bucket in struct.unpack('<%dQ' % numBuckets, bucketsBuf):
+            if bucket != 0:
+                for entry in _hash_jit_bucket_entries(bucket):
+                    # Methods spanning more buckets are stored in each of them
+                    if entry not in seen:
+                        seen.add(entry)
+                        artifacts.append(entry)
+    return artifacts
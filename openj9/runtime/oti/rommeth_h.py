@@ -1,10 +1,11 @@
 from vdb.utils.C import *
 from omr.include_core.omrcomp_h import *
 from openj9.runtime.oti.j9modifiers_api_h import *
+from openj9.runtime.types import sizeof, pointer_type
 
 #define J9EXCEPTIONINFO_HANDLERS(info) ((J9ExceptionHandler *) (((U_8 *) (info)) + sizeof(J9ExceptionInfo)))
 def J9EXCEPTIONINFO_HANDLERS(info):
-    return (info.cast(U_8_ptr) + sizeof('J9ExceptionInfo')).cast(gdb.lookup_type('J9ExceptionHandler').pointer())
+    return (info.cast(U_8_ptr) + sizeof('J9ExceptionInfo')).cast(pointer_type('J9ExceptionHandler'))
 
 #define J9_BYTECODE_START_FROM_ROM_METHOD(romMethod) (((U_8 *) (romMethod)) + sizeof(J9ROMMethod))
 def J9_BYTECODE_START_FROM_ROM_METHOD(romMethod):
@@ -35,5 +36,5 @@ def J9_EXCEPTION_DATA_FROM_ROM_METHOD(romMethod):
         exceptionInfo = J9_GENERIC_SIG_ADDR_FROM_ROM_METHOD(romMethod) + 1
     else:
         exceptionInfo = J9_GENERIC_SIG_ADDR_FROM_ROM_METHOD(romMethod)
-    return exceptionInfo.cast(gdb.lookup_type('J9ExceptionInfo').pointer())
+    return exceptionInfo.cast(pointer_type('J9ExceptionInfo'))
 
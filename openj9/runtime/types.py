@@ -0,0 +1,166 @@
+# Copyright (c) 2022 Jan Vrany
+#
+# This program and the accompanying materials are made available under
+# the terms of the MIT license, see LICENSE file.
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Registry of GDB types used by OpenJ9 support. Types, their sizes and
+field layouts are looked up by name once and cached until objfiles
+change.
+"""
+import gdb
+
+from openj9 import events
+from openj9 import memory
+
+def find_field(ty, name, bitpos = 0):
+    """
+    Find field `name` in struct type `ty`, including fields inherited from base
+    classes. Return a tuple (bitpos, bitsize, type) or None if there's no such
+    field. `bitpos` is relative to the start of `ty`.
+    """
+    for field in ty.fields():
+        if field.name == name:
+            return (bitpos + field.bitpos, field.bitsize, field.type)
+        if field.is_base_class:
+            found = find_field(field.type.strip_typedefs(), name, bitpos + field.bitpos)
+            if found != None:
+                return found
+    return None
+
+# Names of signed integer types, used when GDB does not provide
+# Type.is_signed (before GDB 12). Note that plain char is unsigned
+# on RISC-V.
+_signed_names = frozenset(('signed char', 'short', 'short int', 'int', 'long', 'long int',
+                           'long long', 'long long int', '__int128'))
+
+def is_signed(ty):
+    """
+    Return True if (typedef-stripped) type `ty` is a signed integer type
+    """
+    if ty.code != gdb.TYPE_CODE_INT:
+        return False
+    if hasattr(ty, 'is_signed'):
+        return ty.is_signed
+    return ty.name in _signed_names
+
+class FieldLayout(object):
+    """
+    Location of a (possibly inherited or nested) field within a struct.
+    Used to extract field values from raw memory without going through
+    gdb.Value.
+    """
+    def __init__(self, ty, path):
+        bitpos = 0
+        for name in path.split('.'):
+            found = find_field(ty.strip_typedefs(), name)
+            if found == None:
+                raise KeyError("no field '%s' in %s" % (name, ty))
+            fieldBitpos, bitsize, ty = found
+            bitpos = bitpos + fieldBitpos
+
+        ty = ty.strip_typedefs()
+        self.offset = bitpos // 8
+        self.bitsize = bitsize
+        if bitsize == 0:
+            self.shift = 0
+            self.size = ty.sizeof
+        else:
+            self.shift = bitpos % 8
+            self.size = (self.shift + bitsize + 7) // 8
+        self.signed = is_signed(ty)
+
+    @property
+    def end(self):
+        return self.offset + self.size
+
+    def extract(self, buf):
+        """
+        Extract value of this field from `buf` which holds struct's bytes
+        """
+        return self._decode(buf[self.offset:self.offset + self.size])
+
+    def read(self, addr):
+        """
+        Read value of this field of a struct at given address
+        """
+        return self._decode(memory.view(addr + self.offset, self.size))
+
+    def _decode(self, raw):
+        # FIXME: assumes little endian target
+        value = int.from_bytes(raw, 'little')
+        nbits = self.size * 8
+        if self.bitsize != 0:
+            value = (value >> self.shift) & ((1 << self.bitsize) - 1)
+            nbits = self.bitsize
+        if self.signed and value & (1 << (nbits - 1)):
+            value = value - (1 << nbits)
+        return value
+
+_types = {}
+_pointer_types = {}
+_sizes = {}
+_fields = {}
+
+def _clear(event = None):
+    if event != None and hasattr(event, 'new_objfile') and not events.is_file_objfile(event.new_objfile):
+        # Objfiles created for compiled methods define no types
+        return
+    _types.clear()
+    _pointer_types.clear()
+    _sizes.clear()
+    _fields.clear()
+
+events.connect('new_objfile', _clear)
+events.connect('clear_objfiles', _clear)
+
+def lookup_type(name):
+    """
+    Return (cached) gdb.Type of given name
+    """
+    ty = _types.get(name)
+    if ty == None:
+        ty = gdb.lookup_type(name)
+        _types[name] = ty
+    return ty
+
+def pointer_type(name):
+    """
+    Return (cached) pointer type to type of given name
+    """
+    ty = _pointer_types.get(name)
+    if ty == None:
+        ty = lookup_type(name).pointer()
+        _pointer_types[name] = ty
+    return ty
+
+def sizeof(name_or_type):
+    """
+    Return size of given type (or type of given name) in bytes
+    """
+    if not isinstance(name_or_type, str):
+        return name_or_type.sizeof
+    size = _sizes.get(name_or_type)
+    if size == None:
+        size = lookup_type(name_or_type).sizeof
+        _sizes[name_or_type] = size
+    return size
+
+def field(name, path):
+    """
+    Return (cached) FieldLayout of field `path` in type of given name
+    """
+    key = (name, path)
+    layout = _fields.get(key)
+    if layout == None:
+        layout = FieldLayout(lookup_type(name), path)
+        _fields[key] = layout
+    return layout
+
+def offsetof(name, path):
+    """
+    Return offset of field `path` in type of given name
+    """
+    return field(name, path).offset
@@ -1,9 +1,13 @@
 import gdb
 
+from collections import namedtuple
+
 from omr.include_core.omrcomp_h import *
 
 from openj9.runtime.oti.j9modifiers_api_h import *
 from openj9.runtime.oti.rommeth_h import *
+from openj9 import memory
+from openj9.runtime.types import sizeof, offsetof
 
 
 def getExtendedModifiersDataFromROMMethod(romMethod):
@@ -63,3 +67,138 @@ def codeTypeAnnotationsFromROMMethod(romMethod):
     else:
         result = annotation
     return result.cast(U_32_ptr)
+
+
+J9ExceptionHandler = namedtuple('J9ExceptionHandler', ['startPC', 'endPC', 'handlerPC', 'exceptionClassIndex'])
+
+class ROMMethodLayout(object):
+    """
+    Decoded layout of a J9ROMMethod and sections following its bytecodes
+    (extended modifiers, generic signature, exception info, annotations
+    and debug info).
+
+    The header, bytecodes and trailing sections are read into a single
+    buffer (growing it only when a section extends past its end) and all
+    offsets and flags are computed in Python. Offsets are relative to the
+    start of the J9ROMMethod.
+    """
+
+    def __init__(self, address):
+        self.address = address
+        self._buf = b''
+
+        headerSize = sizeof('J9ROMMethod')
+        self._need(headerSize)
+        self.modifiers = self._u(offsetof('J9ROMMethod', 'modifiers'), 4)
+        self.bytecodeSize = self._u(offsetof('J9ROMMethod', 'bytecodeSizeLow'), 2) \
+                         + (self._u(offsetof('J9ROMMethod', 'bytecodeSizeHigh'), 1) << 16)
+        self.bytecodesOffset = headerSize
+        offset = headerSize + ((self.bytecodeSize + 3) & ~3)
+
+        self.extendedModifiers = 0
+        if self.modifiers & J9Acc.MethodHasExtendedModifiers:
+            self.extendedModifiers = self._u(offset, 4)
+            offset = offset + 4
+
+        self.genericSignatureOffset = None
+        if self.modifiers & J9Acc.MethodHasGenericSignature:
+            self.genericSignatureOffset = offset
+            offset = offset + 4
+
+        self.exceptionInfoOffset = None
+        self.exceptionHandlers = []
+        self.throwNamesOffset = None
+        self.throwCount = 0
+        if self.modifiers & J9Acc.MethodHasExceptionInfo:
+            self.exceptionInfoOffset = offset
+            catchCount = self._u(offset + offsetof('J9ExceptionInfo', 'catchCount'), 2)
+            self.throwCount = self._u(offset + offsetof('J9ExceptionInfo', 'throwCount'), 2)
+            handlerSize = sizeof('J9ExceptionHandler')
+            handlersOffset = offset + sizeof('J9ExceptionInfo')
+            self._need(handlersOffset + catchCount * handlerSize + self.throwCount * 4)
+            for i in range(0, catchCount):
+                handler = handlersOffset + i * handlerSize
+                self.exceptionHandlers.append(J9ExceptionHandler(
+                        self._u(handler + offsetof('J9ExceptionHandler', 'startPC'), 4),
+                        self._u(handler + offsetof('J9ExceptionHandler', 'endPC'), 4),
+                        self._u(handler + offsetof('J9ExceptionHandler', 'handlerPC'), 4),
+                        self._u(handler + offsetof('J9ExceptionHandler', 'exceptionClassIndex'), 4)))
+            self.throwNamesOffset = handlersOffset + catchCount * handlerSize
+            offset = self.throwNamesOffset + self.throwCount * 4
+
+        # Length-prefixed sections, each is a tuple (offset of data, length)
+        # or None if not present.
+        self.methodAnnotations, offset = self._section(offset, self.modifiers & J9Acc.MethodHasMethodAnnotations)
+        self.parameterAnnotations, offset = self._section(offset, self.modifiers & J9Acc.MethodHasParameterAnnotations)
+        self.defaultAnnotation, offset = self._section(offset, self.modifiers & J9Acc.MethodHasDefaultAnnotation)
+        self.methodTypeAnnotations, offset = self._section(offset, self.extendedModifiers & CFR_METHOD_EXT_HAS_METHOD_TYPE_ANNOTATIONS)
+        self.codeTypeAnnotations, offset = self._section(offset, self.extendedModifiers & CFR_METHOD_EXT_HAS_CODE_TYPE_ANNOTATIONS)
+
+        self.debugInfoOffset = None
+        self.lineNumberCount = 0
+        self.lineNumberTableOffset = None
+        self.lineNumberTableSize = 0
+        if self.modifiers & J9Acc.MethodHasDebugInfo:
+            self.debugInfoOffset = offset
+            lineNumberCount = self._u(offset + offsetof('J9MethodDebugInfo', 'lineNumberCount'), 4)
+            if lineNumberCount != 0:
+                # See getLineNumberCount() and getLineNumberCompressedSize() in optinfo.c:
+                # if the lowest bit is set, count does not fit into 15 bits and the
+                # compressed size is stored in an extra U_32 following J9MethodDebugInfo.
+                if 0 == (lineNumberCount & 1):
+                    self.lineNumberCount = (lineNumberCount >> 1) & 0x7FFF
+                    self.lineNumberTableSize = (lineNumberCount >> 16) & 0xFFFF
+                    self.lineNumberTableOffset = offset + sizeof('J9MethodDebugInfo')
+                else:
+                    self.lineNumberCount = lineNumberCount >> 1
+                    self.lineNumberTableSize = self._u(offset + sizeof('J9MethodDebugInfo'), 4)
+                    self.lineNumberTableOffset = offset + sizeof('J9MethodDebugInfo') + 4
+                self._need(self.lineNumberTableOffset + self.lineNumberTableSize)
+
+    def _need(self, end):
+        """
+        Make sure the buffer holds (at least) first `end` bytes.
+        """
+        if end <= len(self._buf):
+            return
+        self._buf = self._buf + memory.read(self.address + len(self._buf), end - len(self._buf))
+
+    def _u(self, offset, size):
+        self._need(offset + size)
+        return int.from_bytes(self._buf[offset:offset + size], 'little')
+
+    def _section(self, offset, present):
+        """
+        Decode length-prefixed section (see SKIP_OVER_LENGTH_DATA_AND_PADDING)
+        at given offset. Return a tuple ((data offset, length) or None, offset
+        of next section).
+        """
+        if not present:
+            return (None, offset)
+        length = self._u(offset, 4)
+        return ((offset + 4, length), offset + 4 + ((length + 3) & ~3))
+
+    @property
+    def bytecodes(self):
+        return memoryview(self._buf)[self.bytecodesOffset:self.bytecodesOffset + self.bytecodeSize]
+
+    @property
+    def lineNumberTable(self):
+        """
+        Compressed line number table as memoryview or None if there's none.
+        """
+        if self.lineNumberTableOffset == None:
+            return None
+        return memoryview(self._buf)[self.lineNumberTableOffset:self.lineNumberTableOffset + self.lineNumberTableSize]
+
+    @property
+    def debugInfoAddress(self):
+        if self.debugInfoOffset == None:
+            return None
+        return self.address + self.debugInfoOffset
+
+def decodeROMMethod(romMethodAddress):
+    """
+    Return ROMMethodLayout of J9ROMMethod at given address
+    """
+    return ROMMethodLayout(int(romMethodAddress))
@@ -3,6 +3,7 @@ import gdb
 
 from openj9.runtime.oti.j9modifiers_api_h import *
 from openj9.runtime.util.mthutil_c import *
+from openj9.runtime.types import sizeof, pointer_type
 
 
 
@@ -15,7 +16,7 @@ def methodDebugInfoFromROMMethod(romMethod):
         result = SKIP_OVER_LENGTH_DATA_AND_PADDING(annotation)
     else:
         result = annotation
-    return result.cast(gdb.lookup_type('J9MethodDebugInfo').pointer())
+    return result.cast(pointer_type('J9MethodDebugInfo'))
 
 def getMethodDebugInfoFromROMMethod(romMethod):
     if (J9ROMMETHOD_HAS_DEBUG_INFO(romMethod)):
@@ -25,7 +26,8 @@ def getMethodDebugInfoFromROMMethod(romMethod):
 
 def getMethodDebugInfoStructureSize(methodDebugInfo):
     if 1 == (int(methodDebugInfo['lineNumberCount']) & 0x1):
-        return sizeof('J9MethodDebugInfo') + sizeof(U_8)
+        # Compressed size of line number table is stored in extra U_32
+        return sizeof('J9MethodDebugInfo') + sizeof(U_32)
     else:
         return sizeof('J9MethodDebugInfo')
 
@@ -64,7 +66,75 @@ def getNextLineNumberFromTable(currentLineNumberPtr, previousLine, previousLoc):
         newLoc = previousLoc + ((encoded >> 9) & 0x1F);
         newLine = previousLine + ilineNumber;
         newLineNumberPtr = currentLineNumberPtr + 2
+    elif 0xC0 == (b1 & 0xE0):
+        m = 1 << (13 - 1)
+
+        #/* 3 bytes encoded : 110xxxxx xxxYYYYY YYYYYYYY */
+        b2 = int((currentLineNumberPtr + 1).dereference())
+        b3 = int((currentLineNumberPtr + 2).dereference())
+
+        encoded = (b1 << 16) | (b2 << 8) | b3
+
+        ulineNumber = encoded & 0x1FFF
+        ilineNumber = (ulineNumber ^ m) - m # /* sign extend from 13bit */
+
+        newLoc = previousLoc + ((encoded >> 13) & 0xFF)
+        newLine = previousLine + ilineNumber
+        newLineNumberPtr = currentLineNumberPtr + 3
+    elif 0xE0 == (b1 & 0xFE):
+        m = 1 << (17 - 1)
+
+        #/* 5 bytes encoded : 1110000x xxxxxxxx xxxxxxxY YYYYYYYY YYYYYYYY */
+        encoded = b1
+        for i in range(1, 5):
+            encoded = (encoded << 8) | int((currentLineNumberPtr + i).dereference())
+
+        ulineNumber = encoded & 0x1FFFF
+        ilineNumber = (ulineNumber ^ m) - m # /* sign extend from 17bit */
+
+        newLoc = previousLoc + ((encoded >> 17) & 0xFFFF)
+        newLine = previousLine + ilineNumber
+        newLineNumberPtr = currentLineNumberPtr + 5
     else:
-        raise Exception('Not implemented :-(')
+        raise Exception('Invalid line number encoding: 0x%02x' % b1)
 
     return ( newLineNumberPtr, ( newLine, newLoc ) )
+
+def decodeLineNumberTable(table, count):
+    """
+    Decode compressed line number table (a bytes-like object, see
+    ROMMethodLayout.lineNumberTable) with `count` entries. Yields
+    tuples (line, bytecode PC), see getNextLineNumberFromTable()
+    """
+    table = bytes(table)
+    line = 0
+    location = 0
+    i = 0
+    for _ in range(0, count):
+        b1 = table[i]
+        if 0 == (b1 & 0x80):
+            #/* 1 byte encoded : 0xxxxxyy */
+            location += (b1 >> 2) & 0x1F
+            line += b1 & 0x3
+            i += 1
+        elif 0x80 == (b1 & 0xC0):
+            #/* 2 bytes encoded : 10xxxxxY YYYYYYYY */
+            encoded = (b1 << 8) | table[i + 1]
+            location += (encoded >> 9) & 0x1F
+            line += ((encoded & 0x1FF) ^ 0x100) - 0x100
+            i += 2
+        elif 0xC0 == (b1 & 0xE0):
+            #/* 3 bytes encoded : 110xxxxx xxxYYYYY YYYYYYYY */
+            encoded = (b1 << 16) | (table[i + 1] << 8) | table[i + 2]
+            location += (encoded >> 13) & 0xFF
+            line += ((encoded & 0x1FFF) ^ 0x1000) - 0x1000
+            i += 3
+        elif 0xE0 == (b1 & 0xFE):
+            #/* 5 bytes encoded : 1110000x xxxxxxxx xxxxxxxY YYYYYYYY YYYYYYYY */
+            encoded = int.from_bytes(table[i:i + 5], 'big')
+            location += (encoded >> 17) & 0xFFFF
+            line += ((encoded & 0x1FFFF) ^ 0x10000) - 0x10000
+            i += 5
+        else:
+            raise Exception('Invalid line number encoding: 0x%02x' % b1)
+        yield (line, location)
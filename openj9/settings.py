@@ -0,0 +1,223 @@
+# Copyright (c) 2022 Jan Vrany
+#
+# This program and the accompanying materials are made available under
+# the terms of the MIT license, see LICENSE file.
+#
+# SPDX-License-Identifier: MIT
+
+"""
+OpenJ9 specific settings, see `set openj9` and `show openj9`.
+"""
+import gdb
+
+class __SetOpenJ9(gdb.Command):
+    """
+    Generic command for setting OpenJ9 specific settings.
+    """
+    def __init__(self):
+        super().__init__('set openj9', gdb.COMMAND_DATA, gdb.COMPLETE_NONE, True)
+
+class __ShowOpenJ9(gdb.Command):
+    """
+    Generic command for showing OpenJ9 specific settings.
+    """
+    def __init__(self):
+        super().__init__('show openj9', gdb.COMMAND_DATA, gdb.COMPLETE_NONE, True)
+
+__SetOpenJ9()
+__ShowOpenJ9()
+
+class __DenseLineTables(gdb.Parameter):
+    """
+    When on, line tables for compiled methods contain an entry for every
+    instruction. When off (the default), an entry is emitted only where
+    line or statement boundary changes.
+    """
+    set_doc = "Set whether to emit an entry for every instruction in line tables."
+    show_doc = "Show whether to emit an entry for every instruction in line tables."
+
+    def __init__(self):
+        super().__init__('openj9 dense-linetables', gdb.COMMAND_DATA, gdb.PARAM_BOOLEAN)
+        self.value = False
+
+dense_linetables = __DenseLineTables()
+
+class __RegistrarMode(gdb.Parameter):
+    """
+    Controls whether the inferior stops when a method is compiled:
+
+      stop-always    stop after every compilation (the default)
+      stop-on-match  stop only if method's name matches regexp set by
+                     `set openj9 registrar-stop-regexp`
+      never-stop     never stop
+
+    Unless stopped, the method is only captured and the inferior resumes
+    immediately. Captured methods are registered in batches, see
+    `set openj9 registrar-batch-size`, or when the inferior stops.
+    """
+    set_doc = "Set whether to stop when a method is compiled."
+    show_doc = "Show whether to stop when a method is compiled."
+
+    def __init__(self):
+        super().__init__('openj9 registrar-mode', gdb.COMMAND_DATA, gdb.PARAM_ENUM,
+                         ['stop-always', 'stop-on-match', 'never-stop'])
+        self.value = 'stop-always'
+
+registrar_mode = __RegistrarMode()
+
+class __RegistrarStopRegexp(gdb.Parameter):
+    """
+    Regexp matched against names of compiled methods when registrar
+    mode is `stop-on-match`.
+    """
+    set_doc = "Set regexp of compiled methods to stop at."
+    show_doc = "Show regexp of compiled methods to stop at."
+
+    def __init__(self):
+        super().__init__('openj9 registrar-stop-regexp', gdb.COMMAND_DATA, gdb.PARAM_STRING)
+        self.value = ''
+
+registrar_stop_regexp = __RegistrarStopRegexp()
+
+class __RegistrarBatchSize(gdb.Parameter):
+    """
+    Number of compiled methods captured (without stopping) before they
+    are registered all at once. Zero means every method is registered
+    as soon as it is captured.
+    """
+    set_doc = "Set the number of compiled methods registered at once."
+    show_doc = "Show the number of compiled methods registered at once."
+
+    def __init__(self):
+        super().__init__('openj9 registrar-batch-size', gdb.COMMAND_DATA, gdb.PARAM_ZUINTEGER)
+        self.value = 256
+
+registrar_batch_size = __RegistrarBatchSize()
+
+class __LazySymtabs(gdb.Parameter):
+    """
+    When on (the default), GDB objfiles, symtabs and symbols for compiled
+    methods are created only when first needed, i.e., when unwinding
+    method's frame or when method is looked up by `lm` or `dm`.
+    When off, they are created as soon as method is compiled.
+    """
+    set_doc = "Set whether to create symtabs for compiled methods lazily."
+    show_doc = "Show whether to create symtabs for compiled methods lazily."
+
+    def __init__(self):
+        super().__init__('openj9 lazy-symtabs', gdb.COMMAND_DATA, gdb.PARAM_BOOLEAN)
+        self.value = True
+
+lazy_symtabs = __LazySymtabs()
+
+class __MemoryCachePages(gdb.Parameter):
+    """
+    Maximum number of (4 KiB) pages of inferior's memory kept in
+    memory cache. Zero disables the cache.
+    """
+    set_doc = "Set the size of memory cache (in pages)."
+    show_doc = "Show the size of memory cache (in pages)."
+
+    def __init__(self):
+        super().__init__('openj9 memory-cache-pages', gdb.COMMAND_DATA, gdb.PARAM_ZUINTEGER)
+        self.value = 4096
+
+memory_cache_pages = __MemoryCachePages()
+
+class __CoreFileMemory(gdb.Parameter):
+    """
+    When on (the default) and debugging a core file, OpenJ9 support reads
+    memory directly from the core file and files mapped into the process
+    rather than through GDB. Memory not found there is still read through
+    GDB.
+    """
+    set_doc = "Set whether to read memory directly from core file."
+    show_doc = "Show whether to read memory directly from core file."
+
+    def __init__(self):
+        super().__init__('openj9 core-file-memory', gdb.COMMAND_DATA, gdb.PARAM_BOOLEAN)
+        self.value = True
+
+core_file_memory = __CoreFileMemory()
+
+class __SymtabGrouping(gdb.Parameter):
+    """
+    Controls how GDB objfiles and compunits are created for compiled
+    methods:
+
+      method   one objfile for every method (the default)
+      batch    one objfile for a batch of methods registered (or, with
+               lazy symtabs, materialized) together
+      segment  like batch, but methods from different code cache
+               segments are never put into the same objfile
+
+    Each method still gets its own symtab, line table and symbol.
+    The size of a batch is limited by `set openj9 symtab-group-size`.
+    """
+    set_doc = "Set how compiled methods are grouped into objfiles."
+    show_doc = "Show how compiled methods are grouped into objfiles."
+
+    def __init__(self):
+        super().__init__('openj9 symtab-grouping', gdb.COMMAND_DATA, gdb.PARAM_ENUM,
+                         ['method', 'batch', 'segment'])
+        self.value = 'method'
+
+symtab_grouping = __SymtabGrouping()
+
+class __SymtabGroupSize(gdb.Parameter):
+    """
+    Maximum number of compiled methods put into single objfile when
+    `set openj9 symtab-grouping` is `batch` or `segment`. Zero means
+    no limit.
+    """
+    set_doc = "Set the maximum number of compiled methods in one objfile."
+    show_doc = "Show the maximum number of compiled methods in one objfile."
+
+    def __init__(self):
+        super().__init__('openj9 symtab-group-size', gdb.COMMAND_DATA, gdb.PARAM_ZUINTEGER)
+        self.value = 256
+
+symtab_group_size = __SymtabGroupSize()
+
+class __MaxStaleVersions(gdb.Parameter):
+    """
+    Maximum number of stale compiled methods (i.e., methods whose code
+    has been reclaimed) kept as versions of Java methods. When exceeded,
+    the oldest ones are forgotten.
+
+    This bounds only the method registry, not GDB symtabs: objfiles
+    created for methods that became stale stay in GDB (there is no way
+    to remove them), so code recompiled at the same address may still
+    be symbolized through a stale compunit. Use lazy symtabs and symtab
+    grouping to limit the number of objfiles.
+    """
+    set_doc = "Set the maximum number of stale compiled methods kept."
+    show_doc = "Show the maximum number of stale compiled methods kept."
+
+    def __init__(self):
+        super().__init__('openj9 max-stale-versions', gdb.COMMAND_DATA, gdb.PARAM_ZUINTEGER)
+        self.value = 1024
+
+max_stale_versions = __MaxStaleVersions()
+
+class __PerfExport(gdb.Parameter):
+    """
+    Controls whether compiled methods are exported for Linux perf as
+    they are registered:
+
+      off      do not export (the default)
+      map      append to perf map /tmp/perf-<pid>.map
+      jitdump  append to jitdump /tmp/jit-<pid>.dump
+      all      both
+
+    See also `jit-export-perf`.
+    """
+    set_doc = "Set whether to export compiled methods for perf."
+    show_doc = "Show whether to export compiled methods for perf."
+
+    def __init__(self):
+        super().__init__('openj9 perf-export', gdb.COMMAND_DATA, gdb.PARAM_ENUM,
+                         ['off', 'map', 'jitdump', 'all'])
+        self.value = 'off'
+
+perf_export = __PerfExport()
@@ -0,0 +1,62 @@
+# Copyright (c) 2022 Jan Vrany
+#
+# This program and the accompanying materials are made available under
+# the terms of the MIT license, see LICENSE file.
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Simple counters and timers to measure overhead of OpenJ9 support,
+see `jit-stats` command.
+"""
+import time
+
+from contextlib import contextmanager
+
+# All Stats instances keyed by name. Retained across reloads.
+_all = globals().get('_all', {})
+
+class Stats(object):
+    """
+    A named group of counters and timers.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.reset()
+        _all[name] = self
+
+    def reset(self):
+        self._counters = {}
+        self._timers = {}
+
+    def increment(self, counter, n = 1):
+        self._counters[counter] = self._counters.get(counter, 0) + n
+
+    def __getitem__(self, counter):
+        return self._counters.get(counter, 0)
+
+    @contextmanager
+    def timed(self, timer):
+        """
+        Measure time spent executing the body of `with` statement
+        and accumulate it to given timer.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            count, total = self._timers.get(timer, (0, 0.0))
+            self._timers[timer] = (count + 1, total + elapsed)
+
+    def counters(self):
+        return sorted(self._counters.items())
+
+    def timers(self):
+        """
+        Return a list of (timer, count, total time in seconds)
+        """
+        return sorted((timer, count, total) for timer, (count, total) in self._timers.items())
+
+def all_stats():
+    return [_all[name] for name in sorted(_all)]
@@ -21,44 +21,177 @@ import re
 import gdb
 import gdb.unwinder
 
+from array import array
+from bisect import bisect_right
 from functools import lru_cache as cache
 from collections import namedtuple
 
+from openj9 import events
+from openj9 import memory
+from openj9.elf import ElfFile, STT_FUNC, STT_NOTYPE
+from openj9.utils import method_index, materialize_methods
+from openj9.stats import Stats
+
+_stats = Stats('JITUnwinder')
+
+# Cache of computed (CFA, RA) keyed by (pc, s11, ra), see
+# JITFrameInfo.unwind_regs()
+_unwind_cache = {}
+
+def _unwind_cache_clear(event = None):
+    _unwind_cache.clear()
+
+def _unwind_cache_clear_on_new_objfile(event):
+    # Objfiles created for compiled methods do not affect unwinding
+    if events.is_file_objfile(event.new_objfile):
+        _unwind_cache.clear()
+
+events.connect('cont', _unwind_cache_clear)
+events.connect('new_objfile', _unwind_cache_clear_on_new_objfile)
+events.connect('register_changed', _unwind_cache_clear)
+events.connect('memory_changed', _unwind_cache_clear)
+
 def _lookup_jit_method_by_pc(pc):
-    for objf in gdb.objfiles():
-        if hasattr(objf, 'j9method'):
-            j9mthd = getattr(objf, 'j9method')
-            if j9mthd.startPC <= pc and pc <= j9mthd.endPC:
-                return j9mthd
+    return method_index().lookup(pc)
+
+JITHelper = namedtuple('JITHelper', ['name', 'start', 'end', 'isReturnFromJIT'])
+
+class JITHelperTable(object):
+    """
+    Table of JIT helpers (and other functions) in libj9jit29.so,
+    built from its ELF symbol table. Used to quickly find a helper
+    at given PC.
+    """
+    def __init__(self, filename, bias):
+        elf = ElfFile(filename)
+        try:
+            symbols = sorted((symbol.value + bias, symbol.size, symbol.name) for symbol in elf.symbols()
+                                if symbol.type in (STT_FUNC, STT_NOTYPE) and symbol.shndx != 0 and symbol.value != 0)
+        finally:
+            elf.close()
+
+        # Group aliases (symbols at the same address) together
+        starts = sorted(set(symbol[0] for symbol in symbols))
+        aliases = dict((start, []) for start in starts)
+        for symbol in symbols:
+            aliases[symbol[0]].append(symbol)
+
+        self._starts = array('Q')
+        self._ends = array('Q')
+        self._names = []
+        self._isReturnFromJIT = []
+        for i in range(0, len(starts)):
+            start = starts[i]
+            # Prefer an alias that has size
+            _, size, name = max(aliases[start], key = lambda symbol: symbol[1])
+            if size == 0:
+                # Helpers written in assembly often have no size,
+                # assume they extend up to the next (distinct) symbol.
+                size = starts[i + 1] - start if i + 1 < len(starts) else 1
+            self._starts.append(start)
+            self._ends.append(start + size)
+            self._names.append(name)
+            self._isReturnFromJIT.append(any(alias[2].startswith('returnFromJIT') for alias in aliases[start]))
+
+    def lookup(self, pc):
+        """
+        Return JITHelper at given PC or None if there's none.
+        """
+        i = bisect_right(self._starts, int(pc)) - 1
+        if i >= 0 and pc < self._ends[i]:
+            return JITHelper(self._names[i], self._starts[i], self._ends[i], self._isReturnFromJIT[i])
+        return None
+
+    def __iter__(self):
+        for i in range(0, len(self._starts)):
+            yield JITHelper(self._names[i], self._starts[i], self._ends[i], self._isReturnFromJIT[i])
+
+def _solib_text_address(filename):
+    """
+    Return address of .text section of loaded shared library or None
+    """
+    # As there's no Python access to solib load address, parse
+    # output of `info sharedlibrary`.
+    for line in gdb.execute('info sharedlibrary', to_string=True).splitlines():
+        match = _solib_line.match(line)
+        if match != None and match.group(3) == filename:
+            return int(match.group(1), 16)
     return None
 
-def _lookup_jit_helper_by_pc(pc):
+_solib_line = re.compile(r"^(0x[0-9a-fA-F]+)\s+(0x[0-9a-fA-F]+)\s+.*?\s(/.*)$")
+
+def _jit_helper_table(objfile):
     """
-    Return gdb.Symbol representing the helper at given PC
-    or None, if no helper is at that PC.
+    Build a JITHelperTable for given objfile (libj9jit29.so) or
+    return None if it cannot be built.
     """
+    try:
+        textAddress = _solib_text_address(objfile.filename)
+        if textAddress != None:
+            elf = ElfFile(objfile.filename)
+            try:
+                bias = textAddress - elf.section('.text').addr
+            finally:
+                elf.close()
+            return JITHelperTable(objfile.filename, bias)
+    except (OSError, ValueError, gdb.error):
+        pass
+    return None
+
+def _on_new_objfile(event):
+    global _cInterpreterAddress
+    objfile = event.new_objfile
+    if not events.is_file_objfile(objfile):
+        return
+    _cInterpreterAddress = None
+    if objfile.filename != None and objfile.filename.endswith('libj9jit29.so'):
+        objfile.progspace.j9helpers = _jit_helper_table(objfile)
+
+def _on_clear_objfiles(event):
+    global _cInterpreterAddress
+    _cInterpreterAddress = None
+    event.progspace.j9helpers = None
+
+events.connect('new_objfile', _on_new_objfile)
+events.connect('clear_objfiles', _on_clear_objfiles)
 
-    # ...helpers are in libj9jit29.so...
-    library = gdb.current_progspace().solib_name(int(pc))
-    if library == None or not library.endswith('libj9jit29.so'):
+def jit_helper_table():
+    """
+    Return JITHelperTable of current progspace or None if
+    libj9jit29.so is not loaded or its table cannot be built.
+    """
+    progspace = gdb.current_progspace()
+    helpers = getattr(progspace, 'j9helpers', None)
+    if helpers == None:
+        # libj9jit29.so loaded before this module or its table
+        # could not be built at that time. Try (once) now.
+        helpers = False
+        for objfile in progspace.objfiles():
+            if objfile.filename != None and objfile.filename.endswith('libj9jit29.so'):
+                helpers = _jit_helper_table(objfile) or False
+        progspace.j9helpers = helpers
+    if helpers == False:
         return None
+    return helpers
 
-    # ...and implemented in assembly so there's no debug info.
-    # Therefore GDB is not able to find a function for the PC,
-    # if it is, it's not helper.
-    block = gdb.current_progspace().block_for_pc(int(pc))
-    if block != None and block.function != None:
+def _lookup_jit_helper_by_pc(pc):
+    """
+    Return JITHelper representing the helper at given PC
+    or None, if no helper is at that PC.
+    """
+    helpers = jit_helper_table()
+    if helpers == None:
         return None
+    return helpers.lookup(pc)
 
-    # As there's no Python access to minimal symbols, hack
-    # around it by parsing output of gdb.format_address().
-    # Sigh!
-    searcher = re.compile("<([^+>]+)\+?[0-9]*>")
-    match = searcher.search(gdb.format_address(int(pc)))
-    if match != None:
-        return gdb.lookup_global_symbol(match.group(1))
+# Address of cInterpreter, see JITFrameInfo._compute_unwind_regs()
+_cInterpreterAddress = None
 
-    return None
+def _cInterpreter_address():
+    global _cInterpreterAddress
+    if _cInterpreterAddress == None:
+        _cInterpreterAddress = int(gdb.lookup_global_symbol('cInterpreter').value().address)
+    return _cInterpreterAddress
 
 class UnwindInfo(object):
     """
@@ -96,7 +229,23 @@ class JITFrameInfo(object):
             assert method != None, "No method for given PC: %s" % hex(pc)
         self.method = method
 
-    def create_unwind_info(self, pending_frame):
+    def unwind_regs(self, pending_frame):
+        """
+        Return a tuple (CFA, RA) for this frame. Computed values are
+        cached until the inferior is resumed or its registers or memory
+        change.
+        """
+        key = (int(self.pc), int(pending_frame.read_register('s11')), int(pending_frame.read_register('ra')))
+        regs = _unwind_cache.get(key)
+        if regs == None:
+            _stats.increment('unwind cache misses')
+            regs = self._compute_unwind_regs(pending_frame)
+            _unwind_cache[key] = regs
+        else:
+            _stats.increment('unwind cache hits')
+        return regs
+
+    def _compute_unwind_regs(self, pending_frame):
         # First, compute SP (frame pointer in fact) and RA (return address)
         # register values.
         #
@@ -153,17 +302,13 @@ class JITFrameInfo(object):
             cfa = pending_frame.read_register('s11') - frame_size_in_bytes
             ra = pending_frame.read_register('ra')
         else:
-            try:
-                maybe_ret = bytes(gdb.selected_inferior().read_memory(self.pc + 4, 4))
-            except gdb.MemoryError:
-                maybe_ret = None
-            if maybe_ret == b'\x67\x80\x00\x00':
+            if self.method.epilogueInfo.isFrameDestroyed(self.pc):
                 # We're inside epilogue after frame has been destoyed and SP (s11) adjusted
                 cfa = pending_frame.read_register('s11') + frame_size_in_bytes
             else:
                 # We're somewhere in between...
                 cfa = pending_frame.read_register('s11')
-            ra = cfa.cast(cfa.type.pointer())[num_frame_slots]
+            ra = int.from_bytes(memory.view(int(cfa) + num_frame_slots*8, 8), 'little')
 
         # Ugh, this is hacky. Since OpenJ9 uses continuation-passing style. In case returning from
         # interpreter.  return address is "faked" and points to "return trampoline" and not past
@@ -176,16 +321,21 @@ class JITFrameInfo(object):
         # Here we decided to go for the first option, assuming the person debugging is more interested
         # in "how on earth I got here" rather than "where would I go if I continue from here".
         helper = _lookup_jit_helper_by_pc(ra)
-        if helper != None and helper.name.startswith('returnFromJIT'):
+        if helper != None and helper.isReturnFromJIT:
             # Okay, this JITed method have been called from interpreter.
             # "Fake" the return address back to point to c_cInterpreter from where
             # this method have been called.
             jalr_offset = 0x3ff7cf98e2 - 0x3ff7cf98b0 # Magic constant :-)
-            jarl_address = int(gdb.lookup_global_symbol('cInterpreter').value().address) + jalr_offset
+            jarl_address = _cInterpreter_address() + jalr_offset
             ra = gdb.Value(jarl_address)
 
+        return (int(cfa), int(ra))
+
+    def create_unwind_info(self, pending_frame):
+        cfa, ra = self.unwind_regs(pending_frame)
+        frame_size_in_bytes = self.method.numFrameSlots()*8 + 8
 
-        id = FrameId(cfa, self.pc)
+        id = FrameId(gdb.Value(cfa), self.pc)
         if hasattr(pending_frame, 'create_unwind_info'):
             ui = pending_frame.create_unwind_info(id)
         else:
@@ -200,9 +350,9 @@ class JITFrameInfo(object):
         #
         # [1]: https://sourceware.org/gdb/current/onlinedocs/gdb/Unwinding-Frames-in-Python.html#Unwinding-Frames-in-Python
         #
-        ui.add_saved_register('s11', cfa + frame_size_in_bytes)
-        ui.add_saved_register('ra',  ra)
-        ui.add_saved_register('pc',  ra)
+        ui.add_saved_register('s11', gdb.Value(cfa + frame_size_in_bytes))
+        ui.add_saved_register('ra',  gdb.Value(ra))
+        ui.add_saved_register('pc',  gdb.Value(ra))
         ui.add_saved_register('sp',  pending_frame.read_register('sp'))
 
         return ui
@@ -226,6 +376,11 @@ class JITUnwinder(gdb.unwinder.Unwinder):
         pc = pending_frame.read_register('pc')
         method = _lookup_jit_method_by_pc(pc)
         if method != None:
+            # Make sure GDB knows the symbol and line table of the method
+            # so it can show them for this frame. Only this method is
+            # materialized here, grouping more (see MethodInfo.materialize())
+            # would make unwinding too slow.
+            materialize_methods([method])
             return JITFrameInfo(pc, method)
             return None
 
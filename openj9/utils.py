@@ -1,8 +1,18 @@
+import re
 import gdb
 
-from functools import lru_cache as cache
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque, namedtuple
+from fnmatch import translate
+from functools import cached_property
 
+from openj9 import events
+from openj9 import memory
+from openj9 import settings
+from openj9.stats import Stats
 from openj9.runtime.util.optinfo_c import *
+from openj9.runtime.types import FieldLayout, find_field, field, sizeof, pointer_type
 
 # TODO: move to openj9.runtime.???
 def J9_BYTECODE_START_FROM_RAM_METHOD(j9Method):
@@ -10,48 +20,506 @@ def J9_BYTECODE_START_FROM_RAM_METHOD(j9Method):
 
 # TODO: move to openj9.runtime.???
 def J9_ROM_METHOD_FROM_RAM_METHOD(j9Method):
-    ty_J9ROMMethod = gdb.lookup_type('J9ROMMethod')
-    return (J9_BYTECODE_START_FROM_RAM_METHOD(j9Method) - ty_J9ROMMethod.sizeof).cast(ty_J9ROMMethod.pointer())
+    return (J9_BYTECODE_START_FROM_RAM_METHOD(j9Method) - sizeof('J9ROMMethod')).cast(pointer_type('J9ROMMethod'))
+
+_stats = Stats('MethodInfo')
+
+# Cache of decoded J9UTF8 strings keyed by address. Cleared whenever
+# inferior's memory may have changed.
+_j9utf8_cache = {}
+
+def _j9utf8_cache_clear(event = None):
+    _j9utf8_cache.clear()
+
+events.connect('cont', _j9utf8_cache_clear)
+events.connect('memory_changed', _j9utf8_cache_clear)
 
 def j9utf8_to_str(j9utf8Val):
-    length = j9utf8Val['length']
-    data = bytes([int(j9utf8Val['data'][i]) for i in range(0, length)])
-    return data.decode(errors='replace')
+    ty = j9utf8Val.type.strip_typedefs()
+    if ty.code == gdb.TYPE_CODE_PTR:
+        addr = int(j9utf8Val)
+        ty = ty.target().strip_typedefs()
+    elif j9utf8Val.address != None:
+        addr = int(j9utf8Val.address)
+    else:
+        # Not in inferior's memory, decode character by character
+        length = j9utf8Val['length']
+        data = bytes([int(j9utf8Val['data'][i]) for i in range(0, length)])
+        return data.decode(errors='replace')
+
+    if addr in _j9utf8_cache:
+        return _j9utf8_cache[addr]
+
+    length = int(j9utf8Val['length'])
+    data = memory.read(addr + ty['data'].bitpos // 8, length)
+    string = data.decode(errors='replace')
+    _j9utf8_cache[addr] = string
+    return string
 
 class RangeMap:
     """
     Utility class to map (integer) ranges to (integer) values.
     Used to map native code to bytecode and bytecode to line numbers.
+
+    Range starts and values are kept in two parallel arrays so lookup
+    is a binary search.
     """
     def __init__(self, mapping = []):
-        self._mapping = []
-        for start, value in mapping:
-            self[start] = value
+        self._starts = array('Q')
+        self._values = array('i')
+        if isinstance(mapping, RangeMap):
+            self._starts.extend(mapping._starts)
+            self._values.extend(mapping._values)
+        else:
+            for start, value in mapping:
+                self._starts.append(start)
+                self._values.append(value)
+            assert all(self._starts[i] < self._starts[i+1] for i in range(0, len(self._starts) - 1))
 
     def __setitem__(self, start, value):
         assert start >= 0
-        assert len(self._mapping) == 0 or self._mapping[-1][0] < start
-        self._mapping.append( (start, value) )
+        assert len(self._starts) == 0 or self._starts[-1] < start
+        self._starts.append(start)
+        self._values.append(value)
 
     def __getitem__(self, lookup):
-        assert len(self._mapping) > 0
-        previous_start = None
-        previous_value = None
-        for start, value in self._mapping:
-            if lookup < start:
+        # Raises KeyError also when the map is empty (for example,
+        # bytecode table of methods registered by jit-scan)
+        i = bisect_right(self._starts, lookup) - 1
+        if i < 0:
+            raise KeyError(lookup)
+        return self._values[i]
+
+    def __len__(self):
+        return len(self._starts)
+
+    def __iter__(self):
+        return zip(self._starts, self._values)
+
+    def ranges(self):
+        """
+        Iterate over ranges as (start, end, value) triples
+        where `end` is exclusive. The last range is open,
+        its end is None.
+        """
+        ends = list(self._starts[1:])
+        ends.append(None)
+        return zip(self._starts, ends, self._values)
+
+    def __repr__(self):
+        return "RangeMap(%s)" % repr(list(self))
+
+MethodName = namedtuple('MethodName', ['className', 'methodName', 'signature'])
+
+class NameIndex(object):
+    """
+    Index of registered methods sorted by their names. Names of methods
+    added are decoded lazily, on first search afterwards, and kept so
+    searches do not have to decode them again.
+    """
+    def __init__(self):
+        self._keys = []
+        self._entries = []
+        self._pending = []
+        self._dirty = False
+
+    def add(self, method):
+        self._pending.append(method)
+
+    def remove(self, method):
+        # Stale methods are filtered out on next search
+        self._dirty = True
+
+    def _flush(self):
+        if len(self._pending) == 0 and not self._dirty:
+            return
+        with _stats.timed('name index update'):
+            entries = [entry for entry in self._entries if not entry[1].isStale]
+            for method in self._pending:
+                if method.isStale:
+                    continue
+                try:
+                    name = MethodName(method.className, method.methodName, method.methodSignature)
+                except (gdb.MemoryError, gdb.error):
+                    _stats.increment('names not decoded')
+                    continue
+                entries.append((name.className + '.' + name.methodName + name.signature, method, name))
+            entries.sort(key=lambda entry: entry[0])
+            self._entries = entries
+            self._keys = [entry[0] for entry in entries]
+            self._pending = []
+            self._dirty = False
+
+    def _range(self, prefix):
+        """
+        Return (lo, hi) indexes of entries whose names start with `prefix`.
+        """
+        return bisect_left(self._keys, prefix), bisect_left(self._keys, prefix + '\U0010ffff')
+
+    def exact(self, name):
+        """
+        Return a list of methods whose name is `name`. The name may be
+        given with or without signature.
+        """
+        self._flush()
+        lo, hi = self._range(name)
+        return [method for key, method, _ in self._entries[lo:hi] if key == name or key[len(name)] == '(']
+
+    def prefix(self, prefix):
+        """
+        Return a list of methods whose name starts with `prefix`.
+        """
+        self._flush()
+        lo, hi = self._range(prefix)
+        return [method for _, method, _ in self._entries[lo:hi]]
+
+    def glob(self, pattern):
+        """
+        Return a list of methods whose name matches shell-style `pattern`.
+        """
+        self._flush()
+        literal = re.match(r'[^*?\[]*', pattern).group(0)
+        lo, hi = self._range(literal)
+        regexp = re.compile(translate(pattern))
+        return [method for key, method, _ in self._entries[lo:hi] if regexp.match(key)]
+
+    def regex(self, regexp):
+        """
+        Return a list of methods whose name matches (searches) `regexp`.
+        """
+        self._flush()
+        regexp = re.compile(regexp)
+        return [method for key, method, _ in self._entries if regexp.search(key)]
+
+    def __len__(self):
+        self._flush()
+        return len(self._entries)
+
+def _overlaps(method1, method2):
+    return method1.startPC <= method2.endPC and method2.startPC <= method1.endPC
+
+class MethodIndex(object):
+    """
+    Index of registered (compiled) methods sorted by their start PC.
+    Used to quickly find a method containing given PC.
+
+    Methods whose code has been reclaimed (or overwritten by code of
+    another method) are removed from the index and marked stale but
+    are kept as versions of the Java method, see versions(). Their GDB
+    objfiles (if materialized) are not removed.
+    """
+    def __init__(self, methods = []):
+        self._starts = []
+        self._methods = []
+        # Methods keyed by address of their metadata
+        self._byMetaData = {}
+        # Lists of methods (oldest first, including stale ones) keyed
+        # by J9Method they have been compiled for.
+        self._versions = {}
+        # Stale methods retained in `_versions` (oldest first),
+        # see `set openj9 max-stale-versions`.
+        self._stale = deque()
+        self.names = NameIndex()
+        for method in methods:
+            self.add(method)
+
+    def add(self, method):
+        start = method.startPC
+        i = bisect_right(self._starts, start)
+        # Code of a new method may only overlap code of methods
+        # that have been reclaimed in the meantime.
+        while i > 0 and _overlaps(self._methods[i - 1], method):
+            self.remove(self._methods[i - 1])
+            i = i - 1
+        while i < len(self._methods) and _overlaps(self._methods[i], method):
+            self.remove(self._methods[i])
+        self._starts.insert(i, start)
+        self._methods.insert(i, method)
+        self._register(method)
+
+    def update(self, methods):
+        """
+        Add all given methods at once.
+        """
+        methods = sorted(methods, key=lambda method: method.startPC)
+        starts = [method.startPC for method in methods]
+        for old in [old for old in self._methods if self._overlapped(old, starts, methods)]:
+            self.remove(old)
+        for method in methods:
+            self._register(method)
+        methods = self._methods + methods
+        methods.sort(key=lambda method: method.startPC)
+        self._starts = [method.startPC for method in methods]
+        self._methods = methods
+
+    def _overlapped(self, old, starts, methods):
+        i = bisect_right(starts, old.endPC) - 1
+        return i >= 0 and _overlaps(old, methods[i])
+
+    def _register(self, method):
+        self._byMetaData[method.metaData.address] = method
+        self._versions.setdefault(method.metaData.ramMethod, []).append(method)
+        self.names.add(method)
+
+    def remove(self, method):
+        """
+        Remove given method from the index and mark it stale.
+        """
+        if method.isStale:
+            return
+        i = bisect_left(self._starts, method.startPC)
+        while i < len(self._methods) and self._starts[i] == method.startPC:
+            if self._methods[i] is method:
+                del self._starts[i]
+                del self._methods[i]
                 break
-            else:
-                previous_start = start
-                previous_value = value
-        if previous_value == None:
-            raise KeyError()
-        return previous_value
+            i = i + 1
+        if self._byMetaData.get(method.metaData.address) is method:
+            del self._byMetaData[method.metaData.address]
+        method.isStale = True
+        self.names.remove(method)
+
+        self._stale.append(method)
+        while len(self._stale) > settings.max_stale_versions.value:
+            self._forget(self._stale.popleft())
+
+    def _forget(self, method):
+        versions = self._versions.get(method.metaData.ramMethod, [])
+        if method in versions:
+            versions.remove(method)
+            if len(versions) == 0:
+                del self._versions[method.metaData.ramMethod]
+
+    def find(self, metaDataAddress):
+        """
+        Return method with metadata (J9JITExceptionTable) at given
+        address or None, if there's no such method.
+        """
+        return self._byMetaData.get(int(metaDataAddress))
+
+    def versions(self, ramMethod):
+        """
+        Return a list of all known compiled bodies of given J9Method,
+        oldest first. Reclaimed ones are marked stale.
+        """
+        return list(self._versions.get(int(ramMethod), []))
+
+    def lookup(self, pc):
+        """
+        Return method whose code contains given PC or None
+        if there's no such method.
+        """
+        i = bisect_right(self._starts, int(pc)) - 1
+        if i >= 0:
+            method = self._methods[i]
+            if pc <= method.endPC:
+                return method
+        return None
+
+    def between(self, start, end):
+        """
+        Return a list of methods starting at or after `start`
+        and before `end`.
+        """
+        return self._methods[bisect_left(self._starts, start):bisect_left(self._starts, end)]
+
+    def adjacent(self, method, predicate, count):
+        """
+        Return a list of (at most) `count` methods (in the order of their
+        start PC) adjacent to given method in the index, including the
+        method itself. The list grows in both directions and stops at the
+        first method for which `predicate` is false.
+        """
+        i = bisect_left(self._starts, method.startPC)
+        if i >= len(self._methods) or self._methods[i] is not method:
+            return [method]
+        lo = i
+        hi = i + 1
+        down = up = True
+        while hi - lo < count and (down or up):
+            if down:
+                if lo > 0 and predicate(self._methods[lo - 1]):
+                    lo = lo - 1
+                else:
+                    down = False
+            if up and hi - lo < count:
+                if hi < len(self._methods) and predicate(self._methods[hi]):
+                    hi = hi + 1
+                else:
+                    up = False
+        return self._methods[lo:hi]
+
+    def __len__(self):
+        return len(self._methods)
 
     def __iter__(self):
-        return iter(self._mapping)
+        return iter(self._methods)
 
     def __repr__(self):
-        return "RangeMap(%s)" % repr(self._mapping)
+        return "<MethodIndex %d methods>" % len(self)
+
+def method_index(progspace = None):
+    """
+    Return index of methods registered in given progspace
+    (or in current progspace if none is given).
+    """
+    if progspace == None:
+        progspace = gdb.current_progspace()
+    if not hasattr(progspace, 'j9methods'):
+        progspace.j9methods = MethodIndex()
+    return progspace.j9methods
+
+def unregister_method(metaDataAddress):
+    """
+    Remove method with metadata at given address from method index,
+    see MethodIndex.remove(). Does nothing if there's no such method.
+    """
+    index = method_index()
+    method = index.find(metaDataAddress)
+    if method != None:
+        index.remove(method)
+        _stats.increment('methods unregistered')
+
+def register_methods(methods):
+    """
+    Register all given methods at once, see MethodInfo.registerCompiled()
+    """
+    method_index().update(methods)
+    if not settings.lazy_symtabs.value:
+        materialize_methods(methods)
+
+# Code cache segments as a list of (heapBase, heapTop), see
+# code_cache_segment(). Segments are allocated while the inferior
+# runs so the list is discarded whenever it is resumed (see also
+# openj9._clear_caches()).
+_code_cache_segments = None
+
+def _code_cache_segments_clear(event = None):
+    global _code_cache_segments
+    _code_cache_segments = None
+
+events.connect('cont', _code_cache_segments_clear)
+
+def code_cache_segment(pc):
+    """
+    Return (heapBase, heapTop) of JIT code cache segment containing
+    given PC or None if not known.
+    """
+    global _code_cache_segments
+    if _code_cache_segments == None:
+        _code_cache_segments = []
+        try:
+            segment = gdb.parse_and_eval('jitConfig->codeCacheList->nextSegment')
+            while int(segment) != 0:
+                _code_cache_segments.append((int(segment['heapBase']), int(segment['heapTop'])))
+                segment = segment['nextSegment']
+        except gdb.error:
+            pass
+    for base, top in _code_cache_segments:
+        if base <= pc and pc < top:
+            return (base, top)
+    return None
+
+def _materialization_group(method):
+    """
+    Return a list of not yet materialized methods to materialize
+    together with given one, see `set openj9 symtab-grouping`.
+    """
+    grouping = settings.symtab_grouping.value
+    if grouping == 'method':
+        return [method]
+    size = settings.symtab_group_size.value
+    if size == 0:
+        size = len(method_index())
+    segment = None
+    if grouping == 'segment':
+        segment = code_cache_segment(method.startPC)
+    def eligible(candidate):
+        if candidate.isMaterialized:
+            return False
+        return segment == None or (segment[0] <= candidate.startPC and candidate.startPC < segment[1])
+    # Compunits of different groups must not overlap, so the group
+    # is a contiguous run of not yet materialized methods.
+    return method_index().adjacent(method, eligible, size)
+
+def materialize_methods(methods):
+    """
+    Create GDB objfiles, compunits, symtabs and symbols for all given
+    methods (unless already created). Methods are put into shared
+    objfiles as set by `set openj9 symtab-grouping`.
+    """
+    methods = sorted((method for method in methods if not method.isMaterialized), key=lambda method: method.startPC)
+    grouping = settings.symtab_grouping.value
+    if grouping == 'method':
+        for method in methods:
+            _materialize_group([method])
+        return
+
+    # Partition methods by code cache segment (if requested)...
+    partitions = {}
+    for method in methods:
+        key = code_cache_segment(method.startPC) if grouping == 'segment' else None
+        partitions.setdefault(key, []).append(method)
+    # ...and then each partition into contiguous runs (so compunits do
+    # not overlap) of at most group size.
+    size = settings.symtab_group_size.value
+    index = method_index()
+    for partition in partitions.values():
+        group = []
+        for method in partition:
+            if len(group) > 0 and (len(group) == size or len(index.between(group[-1].startPC + 1, method.startPC)) > 0):
+                _materialize_group(group)
+                group = []
+            group.append(method)
+        if len(group) > 0:
+            _materialize_group(group)
+
+def _materialize_group(methods):
+    """
+    Create single GDB objfile and compunit for all given methods (sorted
+    by start PC) with a symtab, line table, block and symbol for each.
+    """
+    with _stats.timed('materialization'):
+        start = methods[0].startPC
+        end = max(method.endPC for method in methods)
+        if len(methods) == 1:
+            name = methods[0].name
+        else:
+            name = 'jit-methods-0x%x-0x%x' % (start, end)
+        objfile = gdb.Objfile(name)
+        # Compunit has global and static block plus one block
+        # for each method.
+        compunit = gdb.Compunit(name, objfile, start, end, 2 + len(methods))
+        ftype = gdb.selected_inferior().architecture().void_type().function(None)
+
+        for method in methods:
+            symtab = gdb.Symtab(method.className + '.java', compunit)
+            gdb.LineTable(symtab, method.linetable())
+
+            block = gdb.Block(compunit.static_block(), method.startPC, method.endPC)
+            symbol = gdb.Symbol(method.name, symtab, ftype,
+                                      gdb.SYMBOL_FUNCTION_DOMAIN, gdb.SYMBOL_LOC_BLOCK,
+                                      block)
+            compunit.static_block().add_symbol(symbol)
+
+            method._objfile = objfile
+            method._symtab = symtab
+
+        objfile.j9methods = methods
+        _stats.increment('objfiles created')
+        _stats.increment('methods materialized', len(methods))
+
+# FIXME: RISC-V specific
+_RISCV_RET = b'\x67\x80\x00\x00' # jalr x0, 0(ra)
+_RISCV_S11 = 27
+
+def _riscv_insns(code, start, end):
+    """
+    Iterate over (offset, instruction word) of (4-byte) instructions
+    in `code` between given offsets.
+    """
+    for offset in range(start, min(end, len(code) - 3), 4):
+        yield offset, int.from_bytes(code[offset:offset + 4], 'little')
 
 class MethodPrologueInfo(object):
     """
@@ -64,6 +532,22 @@ class MethodPrologueInfo(object):
         self._jitEntry = self._method.startPC + self._method.numParamSlots() * 4
         self._frameAllocd = self._jitEntry + 4 + 4
         self._stackChecked = self._frameAllocd + 4 + 4
+
+        # If method's code is available, find exact boundaries, i.e.,
+        # instructions after `addi s11,s11,-N` (frame allocation)
+        # and after `blt s11,...` (stack check).
+        code = method.code
+        if code != None:
+            jitEntryOffset = self._jitEntry - self.startPC
+            for offset, insn in _riscv_insns(code, jitEntryOffset, jitEntryOffset + 16 * 4):
+                opcode = insn & 0x7F
+                funct3 = (insn >> 12) & 0x7
+                rs1 = (insn >> 15) & 0x1F
+                if opcode == 0x13 and funct3 == 0 and rs1 == _RISCV_S11 and ((insn >> 7) & 0x1F) == _RISCV_S11 and (insn & 0x80000000):
+                    self._frameAllocd = self.startPC + offset + 4
+                elif opcode == 0x63 and funct3 in (4, 6) and rs1 == _RISCV_S11:
+                    self._stackChecked = self.startPC + offset + 4
+                    break
         self._frameBuilt = self._stackChecked # FIXME!!!
 
     @property
@@ -90,31 +574,236 @@ class MethodPrologueInfo(object):
     def endPC(self):
         return self.frameBuilt
 
+class MethodEpilogueInfo(object):
+    """
+    A helper object that describes method's epilogues. Return sequence
+    may be inlined into the code multiple times, each ends with `ret`.
+    """
+
+    def __init__(self, method):
+        self._returnSites = array('Q')
+        code = method.code
+        if code != None:
+            offset = code.find(_RISCV_RET)
+            while offset >= 0:
+                if offset % 4 == 0:
+                    self._returnSites.append(method.startPC + offset)
+                offset = code.find(_RISCV_RET, offset + 1)
+
+    @property
+    def returnSites(self):
+        return self._returnSites
+
+    def isFrameDestroyed(self, pc):
+        """
+        Return True if given PC is in an epilogue after the frame has been
+        destroyed and SP (s11) adjusted, that is at the instruction reloading
+        return address or at `ret`.
+        """
+        i = bisect_left(self._returnSites, int(pc))
+        return i < len(self._returnSites) and (self._returnSites[i] == pc or self._returnSites[i] == pc + 4)
+
+class InstructionLayout(object):
+    """
+    Layout of TR::Instruction (and TR::Node) fields needed to extract
+    PC-to-bytecode table using raw memory reads.
+    """
+    def __init__(self, insnType):
+        self._next = FieldLayout(insnType, '_next')
+        self._binaryLength = FieldLayout(insnType, '_binaryLength')
+        self._binaryEncodingBuffer = FieldLayout(insnType, '_binaryEncodingBuffer')
+        self._node = FieldLayout(insnType, '_node')
+        self._size = max(self._next.end, self._binaryLength.end, self._binaryEncodingBuffer.end, self._node.end)
+
+        nodeType = find_field(insnType.strip_typedefs(), '_node')[2].strip_typedefs().target()
+        self._byteCodeIndex = FieldLayout(nodeType, '_byteCodeInfo._byteCodeIndex')
+
+    def bytecodeTable(self, firstInsnAddr):
+        """
+        Extract PC-to-bytecode table from the list of instructions
+        starting at given address.
+        """
+        bytecodeTable = RangeMap()
+        nodeToBC = {}
+        prevBC = -1
+        # The very first instruction is descriptor word!
+        for currPC, _, node in self.instructions(self._next.read(firstInsnAddr)):
+            currBC = nodeToBC.get(node)
+            if currBC == None:
+                currBC = self._byteCodeIndex.read(node)
+                nodeToBC[node] = currBC
+            if prevBC != currBC:
+                bytecodeTable[currPC] = currBC
+                prevBC = currBC
+        return bytecodeTable
+
+    def instructions(self, firstInsnAddr):
+        """
+        Iterate over (PC, binary length, node address) of instructions
+        in the list starting at given address. Pseudo instructions
+        (labels, BBStart, ...) are skipped.
+        """
+        insnAddr = firstInsnAddr
+        while insnAddr != 0:
+            insn = memory.view(insnAddr, self._size)
+            length = self._binaryLength.extract(insn)
+            if length > 0:
+                yield self._binaryEncodingBuffer.extract(insn), length, self._node.extract(insn)
+            insnAddr = self._next.extract(insn)
+
+def instructions(firstInsn):
+    """
+    Return a list of (PC, binary length, node address) of instructions
+    in the list starting at given instruction (gdb.Value). Pseudo
+    instructions are skipped.
+    """
+    layout = _layout(firstInsn.type, InstructionLayout)
+    if layout != None:
+        try:
+            return list(layout.instructions(int(firstInsn)))
+        except gdb.MemoryError:
+            pass
+    insns = []
+    insn = firstInsn
+    while (int(insn) != 0): # while insn != nullptr
+        sz = int(insn['_binaryLength'])
+        if sz > 0:
+            insns.append((int(insn['_binaryEncodingBuffer']), sz, int(insn['_node'])))
+        insn = insn['_next']
+    return insns
+
+class MethodMetaData(object):
+    """
+    Snapshot of J9JITExceptionTable fields used in hot paths
+    (unwinder, method lookup) as plain ints.
+    """
+    __slots__ = ('address', 'startPC', 'endPC', 'totalFrameSize', 'slots', 'ramMethod')
+
+    def __init__(self, address, startPC, endPC, totalFrameSize, slots, ramMethod):
+        self.address = address
+        self.startPC = startPC
+        self.endPC = endPC
+        self.totalFrameSize = totalFrameSize
+        self.slots = slots
+        self.ramMethod = ramMethod
+
+    @staticmethod
+    def fromValue(metaDataVal):
+        """
+        Create snapshot using gdb.Value field access. Slow, used only
+        when the layout of J9JITExceptionTable cannot be resolved.
+        """
+        return MethodMetaData(int(metaDataVal), int(metaDataVal['startPC']), int(metaDataVal['endPC']),
+                              int(metaDataVal['totalFrameSize']), int(metaDataVal['slots']),
+                              int(metaDataVal['ramMethod']))
+
+class MetaDataLayout(object):
+    """
+    Layout of J9JITExceptionTable fields needed to create
+    MethodMetaData using a single raw memory read.
+    """
+    def __init__(self, metaDataType):
+        self._startPC = FieldLayout(metaDataType, 'startPC')
+        self._endPC = FieldLayout(metaDataType, 'endPC')
+        self._totalFrameSize = FieldLayout(metaDataType, 'totalFrameSize')
+        self._slots = FieldLayout(metaDataType, 'slots')
+        self._ramMethod = FieldLayout(metaDataType, 'ramMethod')
+        self._size = max(self._startPC.end, self._endPC.end, self._totalFrameSize.end, self._slots.end, self._ramMethod.end)
+
+    def metaData(self, address):
+        buf = memory.view(address, self._size)
+        return MethodMetaData(address, self._startPC.extract(buf), self._endPC.extract(buf),
+                              self._totalFrameSize.extract(buf), self._slots.extract(buf),
+                              self._ramMethod.extract(buf))
+
+# Layouts for types with no objfile (such as types from a core file
+# or synthesized pointer types) keyed by (layout class, type name)
+_layouts = {}
+
+def _layouts_clear(event = None):
+    if event != None and hasattr(event, 'new_objfile') and not events.is_file_objfile(event.new_objfile):
+        # Objfiles created for compiled methods define no types
+        return
+    _layouts.clear()
+
+events.connect('new_objfile', _layouts_clear)
+events.connect('clear_objfiles', _layouts_clear)
+
+def _layout(ptrType, layoutClass):
+    """
+    Return an instance of `layoutClass` for type `ptrType` points to or None,
+    if the layout cannot be resolved. The layout is computed once per
+    objfile (or once per type name if the type has no objfile).
+    """
+    attr = 'j9layout_' + layoutClass.__name__
+    objfile = ptrType.objfile
+    if objfile != None:
+        if hasattr(objfile, attr):
+            return getattr(objfile, attr)
+    else:
+        key = (attr, str(ptrType.strip_typedefs()))
+        if key in _layouts:
+            return _layouts[key]
+    try:
+        layout = layoutClass(ptrType.strip_typedefs().target())
+    except (gdb.error, KeyError, TypeError, AttributeError):
+        layout = None
+    if objfile != None:
+        setattr(objfile, attr, layout)
+    else:
+        _layouts[key] = layout
+    return layout
 
 class MethodInfo(object):
     def __init__(self, metaDataVal, compilerVal = None, bytecodeTable = None):
         assert compilerVal != None or bytecodeTable != None
         self._metaDataVal = metaDataVal
+        self._metaData = None
+        self._objfile = None
+        self._symtab = None
+        self.isStale = False
+        # Time the code has been loaded (see perf.timestamp()) or None
+        # if not known
+        self.loadTimestamp = None
 
         if bytecodeTable != None:
-            self._bytecodeTable = RangeMap(bytecodeTable._mapping)
+            self._bytecodeTable = RangeMap(bytecodeTable)
         else:
             # We have to extract PC-to-bytecode table eagerly here
             # as compiler object is transient and might be gone
             # by the time we need the table
-            self._bytecodeTable = RangeMap()
-
-            insn = compilerVal['_codeGenerator']['_firstInstruction']['_next'] # The very first instruction is descriptor word!
-            prevBC = -1
-            while (int(insn) != 0): # while insn != nullptr
-                if int(insn['_binaryLength']) > 0:
-                    # `insn` is not a pseudo instruction (label, BBstart, ...)
-                    currBC = int(insn['_node']['_byteCodeInfo']['_byteCodeIndex'])
-                    if prevBC != currBC:
-                        currPC = int(insn['_binaryEncodingBuffer'])
-                        self._bytecodeTable[currPC] = currBC
-                        prevBC = currBC
-                insn = insn['_next']
+            firstInsn = compilerVal['_codeGenerator']['_firstInstruction']
+            layout = _layout(firstInsn.type, InstructionLayout)
+            self._bytecodeTable = None
+            if layout != None:
+                try:
+                    with _stats.timed('bytecode table (raw)'):
+                        self._bytecodeTable = layout.bytecodeTable(int(firstInsn))
+                except gdb.MemoryError:
+                    pass
+            if self._bytecodeTable == None:
+                with _stats.timed('bytecode table (gdb.Value)'):
+                    self._bytecodeTable = self._extractBytecodeTable(firstInsn)
+
+    @staticmethod
+    def _extractBytecodeTable(firstInsn):
+        """
+        Extract PC-to-bytecode table using gdb.Value field access. Slow,
+        used only when the layout of instructions cannot be resolved.
+        """
+        bytecodeTable = RangeMap()
+        insn = firstInsn['_next'] # The very first instruction is descriptor word!
+        prevBC = -1
+        while (int(insn) != 0): # while insn != nullptr
+            if int(insn['_binaryLength']) > 0:
+                # `insn` is not a pseudo instruction (label, BBstart, ...)
+                currBC = int(insn['_node']['_byteCodeInfo']['_byteCodeIndex'])
+                if prevBC != currBC:
+                    currPC = int(insn['_binaryEncodingBuffer'])
+                    bytecodeTable[currPC] = currBC
+                    prevBC = currBC
+            insn = insn['_next']
+        return bytecodeTable
 
     def __repr__(self):
         return "<MethodInfo name=%s>" % self.name
@@ -123,51 +812,64 @@ class MethodInfo(object):
     def bytecodeTable(self):
         return self._bytecodeTable
 
-    @property
+    @cached_property
+    def romMethodLayout(self):
+        """
+        Decoded layout of method's J9ROMMethod, see ROMMethodLayout
+        """
+        bytecodes = field('J9Method', 'bytecodes').read(self.metaData.ramMethod)
+        return decodeROMMethod(bytecodes - sizeof('J9ROMMethod'))
+
+    @cached_property
     def lineNumberTable(self):
-        ramMethod = self._metaDataVal['ramMethod']
-        romMethod = J9_ROM_METHOD_FROM_RAM_METHOD(ramMethod)
-        methodDebugInfo = getMethodDebugInfoFromROMMethod(romMethod)
-
-        if methodDebugInfo != None:
-            lineNumberTablePtr = getLineNumberTable(methodDebugInfo)
-            if lineNumberTablePtr != None:
-                lineNumberTable = RangeMap()
-                line = 0
-                location = 0
-                for i in range(0, getLineNumberCount(methodDebugInfo)):
-                    lineNumberTablePtr, ( line, location) = getNextLineNumberFromTable(lineNumberTablePtr, line, location)
-                    lineNumberTable[location] = line
-                return lineNumberTable
+        layout = self.romMethodLayout
+        table = layout.lineNumberTable
+        if table != None:
+            # Several lines may start at the same location,
+            # the last one wins.
+            lines = {}
+            for line, location in decodeLineNumberTable(table, layout.lineNumberCount):
+                lines[location] = line
+            return RangeMap(lines.items())
         return None
 
-    @property
-    @cache
+    @cached_property
     def className(self):
         return j9utf8_to_str(self._metaDataVal['className'])
 
-    @property
-    @cache
+    @cached_property
     def methodName(self):
         return j9utf8_to_str(self._metaDataVal['methodName'])
 
-    @property
-    @cache
+    @cached_property
     def methodSignature(self):
         return j9utf8_to_str(self._metaDataVal['methodSignature'])
 
-    @property
-    @cache
+    @cached_property
     def name(self):
         return self.className + '.' + self.methodName + self.methodSignature
 
+    @property
+    def metaData(self):
+        """
+        Snapshot of method's metadata (J9JITExceptionTable), see
+        MethodMetaData. Read once and kept until method is reclaimed.
+        """
+        if self._metaData == None:
+            layout = _layout(self._metaDataVal.type, MetaDataLayout)
+            if layout != None:
+                self._metaData = layout.metaData(int(self._metaDataVal))
+            else:
+                self._metaData = MethodMetaData.fromValue(self._metaDataVal)
+        return self._metaData
+
     @property
     def startPC(self):
-        return int(self._metaDataVal['startPC'])
+        return self.metaData.startPC
 
     @property
     def endPC(self):
-        return int(self._metaDataVal['endPC'])
+        return self.metaData.endPC
 
     def numFrameSlots(self):
         """
@@ -178,29 +880,73 @@ class MethodInfo(object):
           * temporaries
           * outgoing parameters
         """
-        return int(self._metaDataVal['totalFrameSize'])
+        return self.metaData.totalFrameSize
 
     def numParamSlots(self):
         """
         Return a number of parameters including
         `this`
         """
-        return int(self._metaDataVal['slots'])
+        return self.metaData.slots
 
-    @property
-    @cache
+    @cached_property
+    def code(self):
+        """
+        Method's machine code as bytes or None if it cannot be read.
+        Read once and kept with the method.
+        """
+        try:
+            return memory.read(self.startPC, self.endPC - self.startPC)
+        except gdb.MemoryError:
+            return None
+
+    @cached_property
     def prologueInfo(self):
         return MethodPrologueInfo(self)
 
+    @cached_property
+    def epilogueInfo(self):
+        return MethodEpilogueInfo(self)
+
     def linetable(self):
         """
         Return GDB linetable for this method
         """
+        lineNumberTable = self.lineNumberTable
+        if lineNumberTable == None or len(self.bytecodeTable) == 0:
+            return []
+
+        prologue = self.prologueInfo
+        if settings.dense_linetables.value:
+            return self._linetable_dense(lineNumberTable, prologue)
+
+        lineTable = []
+        def emit(pc, line):
+            is_stmt = pc >= prologue.endPC      # is this a good place to place breakpoint for given line?
+            prologue_end = pc == prologue.endPC # is this the first instruction after prologue?
+            if len(lineTable) == 0 or prologue_end or lineTable[-1].line != line or lineTable[-1].is_stmt != is_stmt:
+                lineTable.append(gdb.LineTableEntry(line, pc, is_stmt, prologue_end))
+
+        endPC = self.endPC
+        for start, end, bci in self.bytecodeTable.ranges():
+            if start >= endPC:
+                break
+            line = lineNumberTable[bci]
+            emit(start, line)
+            if start < prologue.endPC and (end == None or prologue.endPC < end):
+                # Prologue ends in the middle of this range
+                emit(prologue.endPC, line)
+        return lineTable
+
+    def _linetable_dense(self, lineNumberTable, prologue):
+        """
+        Return GDB linetable for this method with an entry for
+        every instruction
+        """
         lineTable = []
         pc = self.startPC
-        prologue = self.prologueInfo
         while pc < self.endPC:
-            line = self.lineNumberTable[self.bytecodeTable[pc]]
+            line = lineNumberTable[self.bytecodeTable[pc]]
             is_stmt = pc >= prologue.endPC      # is this a good place to place breakpoint for given line?
             prologue_end = pc == prologue.endPC # is this the first instruction after prologue?
             lineTable.append(gdb.LineTableEntry(line, pc, is_stmt, prologue_end))
@@ -210,33 +956,42 @@ class MethodInfo(object):
     def registerCompiled(self):
         """
         Register method in GDB.
-        """
 
-        # We use simplistic approach where for every compiled method
-        # an objfile, compunit and a single "function" block is created.
-
-        self._objfile = gdb.Objfile(self.name)
-        compunit = gdb.Compunit(self.name, self._objfile, self.startPC, self.endPC, 3)
-
-        symtab = gdb.Symtab(self.className + '.java', compunit)
-        gdb.LineTable(symtab, self.linetable())
-
-        block = gdb.Block(compunit.static_block(), self.startPC, self.endPC)
-
-        ftype = gdb.selected_inferior().architecture().void_type().function(None)
-        symbol = gdb.Symbol(self.name, symtab, ftype,
-                                  gdb.SYMBOL_FUNCTION_DOMAIN, gdb.SYMBOL_LOC_BLOCK,
-                                  block)
+        Unless `set openj9 lazy-symtabs` is off, the method is only
+        recorded in method index. GDB objfile, symtab and symbol for
+        it are created when first needed, see materialize().
+        """
+        method_index().add(self)
+        if not settings.lazy_symtabs.value:
+            self.materialize()
 
-        compunit.static_block().add_symbol(symbol)
+    @property
+    def isMaterialized(self):
+        return self._objfile != None
 
-        self._objfile.j9method = self
+    def materialize(self):
+        """
+        Create GDB objfile, compunit, symtab and symbol for this
+        method (unless already created). Depending on
+        `set openj9 symtab-grouping`, other methods not yet materialized
+        may be materialized along with this one.
+        """
+        if self._objfile != None:
+            return
+        materialize_methods(_materialization_group(self))
 
 # Upon reload, replace existing instances of MethodInfo
-for objfile in gdb.objfiles():
-    if hasattr(objfile, 'j9method'):
-        old = getattr(objfile, 'j9method')
-        new = MethodInfo(old._metaDataVal, bytecodeTable=old._bytecodeTable)
-        new._objfile = old._objfile
-
-        setattr(objfile, 'j9method', new)
+# (and rebuild method indexes)
+for progspace in gdb.progspaces():
+    index = MethodIndex()
+    if hasattr(progspace, 'j9methods'):
+        for old in progspace.j9methods:
+            new = MethodInfo(old._metaDataVal, bytecodeTable=old._bytecodeTable)
+            new.loadTimestamp = getattr(old, 'loadTimestamp', None)
+            if getattr(old, '_objfile', None) != None:
+                new._objfile = old._objfile
+                new._symtab = old._symtab
+                methods = getattr(new._objfile, 'j9methods', [])
+                new._objfile.j9methods = [new if method is old else method for method in methods]
+            index.add(new)
+    progspace.j9methods = index